@@ -1,15 +1,28 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Literal
 import json
 from dotenv import load_dotenv
-from datetime import datetime
-from market import get_share_price
-from database import write_account, read_account, write_log
+import numpy as np
+import clock
+from market import get_share_price, get_share_prices
+from rebalancer import plan_rebalance
+from fx import FxSnapshot, SUPPORTED_CURRENCIES, get_fx_snapshot, revalue
+from database import write_account, read_account_fields, read_portfolio_values, write_log, update_account, write_trade, write_trades, adjust_cash, write_portfolio_value, LEDGER_CURRENCY
 
 load_dotenv(override=True)
 
 INITIAL_BALANCE = 10_000.0
 SPREAD = 0.002
 
+# What Account.view returns by default: everything except the full histories
+ACCOUNT_VIEW_FIELDS = ["balance", "cash", "strategy", "holdings", "cost_basis", "realized_pnl", "transactions", "portfolio_value"]
+ACCOUNT_VIEW_TRANSACTIONS = 10
+
+# Account.get loads the state plus a bounded slice of history, so trades and reports don't grow with it
+ACCOUNT_STATE_FIELDS = ["balance", "cash", "strategy", "holdings", "cost_basis", "realized_pnl", "transactions"]
+ACCOUNT_RECENT_TRANSACTIONS = 50
+ACCOUNT_SERIES_MAX_POINTS = 200
+
 
 class Transaction(BaseModel):
     symbol: str
@@ -25,18 +38,32 @@ class Transaction(BaseModel):
         return f"{abs(self.quantity)} shares of {self.symbol} at {self.price} each."
 
 
+class Order(BaseModel):
+    symbol: str = Field(description="The symbol of the stock")
+    action: Literal["buy", "sell"]
+    quantity: int = Field(gt=0, description="The number of shares")
+
+
 class Account(BaseModel):
     name: str
+    # Cash in the ledger currency, which trades settle in, and cash held in any other currency
     balance: float
+    cash: dict[str, float] = {}
     strategy: str
     holdings: dict[str, int]
+    # Average-cost basis of each holding and P&L locked in by sales, maintained trade by trade
+    cost_basis: dict[str, float] = {}
+    realized_pnl: float = 0.0
+    # The most recent transactions and a downsampled value history; the full ledger stays in the database
     transactions: list[Transaction]
     portfolio_value_time_series: list[tuple[str, float]]
 
     @classmethod
     def get(cls, name: str):
-        fields = read_account(name.lower())
-        if not fields:
+        fields = read_account_fields(name.lower(), ACCOUNT_STATE_FIELDS, ACCOUNT_RECENT_TRANSACTIONS)
+        if fields:
+            fields["portfolio_value_time_series"] = read_portfolio_values(name, resolution="auto", max_points=ACCOUNT_SERIES_MAX_POINTS)
+        else:
             fields = {
                 "name": name.lower(),
                 "balance": INITIAL_BALANCE,
@@ -49,32 +76,84 @@ class Account(BaseModel):
         return cls(**fields)
     
     
+    @staticmethod
+    def view(name: str, fields: list[str] | None = None, last_transactions: int | None = ACCOUNT_VIEW_TRANSACTIONS) -> str:
+        """ Return a json string of selected account fields, read without pricing or writing anything. """
+        fields = fields or ACCOUNT_VIEW_FIELDS
+        unknown = set(fields) - set(ACCOUNT_VIEW_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown account fields {sorted(unknown)}; choose from {ACCOUNT_VIEW_FIELDS}")
+        data = read_account_fields(name.lower(), fields, last_transactions)
+        if data is None:
+            # New accounts are created on first access, as with Account.get
+            data = read_account_fields(Account.get(name).name, fields, last_transactions)
+        return json.dumps(data)
+
     def save(self):
+        """ Replace everything stored for the account with this one; for new or reset accounts only, as get loads a projection. """
         write_account(self.name.lower(), self.model_dump())
 
     def reset(self, strategy: str):
         self.balance = INITIAL_BALANCE
+        self.cash = {}
         self.strategy = strategy
         self.holdings = {}
+        self.cost_basis = {}
+        self.realized_pnl = 0.0
         self.transactions = []
         self.portfolio_value_time_series = []
         self.save()
 
-    def deposit(self, amount: float):
-        """ Deposit funds into the account. """
+    def _apply(self, state: dict) -> None:
+        """ Take on the stored state that write_trade reports after a trade. """
+        self.balance, self.realized_pnl = state["balance"], state["realized_pnl"]
+        if state["quantity"]:
+            self.holdings[state["symbol"]] = state["quantity"]
+            self.cost_basis[state["symbol"]] = state["cost_basis"]
+        else:
+            self.holdings.pop(state["symbol"], None)
+            self.cost_basis.pop(state["symbol"], None)
+
+    def deposit(self, amount: float, currency: str = LEDGER_CURRENCY):
+        """ Deposit funds into the account, in any supported currency. """
+        currency = currency.upper()
         if amount <= 0:
             raise ValueError("Deposit amount must be positive.")
-        self.balance += amount
-        print(f"Deposited ${amount}. New balance: ${self.balance}")
-        self.save()
+        if currency not in SUPPORTED_CURRENCIES:
+            raise ValueError(f"Currency {currency} is not supported")
+        self.balance, self.cash = adjust_cash(self.name, {currency: amount})
+        print(f"Deposited {amount} {currency}. New balance: {self.cash_by_currency()}")
 
-    def withdraw(self, amount: float):
+    def withdraw(self, amount: float, currency: str = LEDGER_CURRENCY):
         """ Withdraw funds from the account, ensuring it doesn't go negative. """
-        if amount > self.balance:
+        currency = currency.upper()
+        # The stored balance is checked too, in case another process spent it since this account was read
+        if amount > self.cash_by_currency().get(currency, 0.0):
             raise ValueError("Insufficient funds for withdrawal.")
-        self.balance -= amount
-        print(f"Withdrew ${amount}. New balance: ${self.balance}")
-        self.save()
+        self.balance, self.cash = adjust_cash(self.name, {currency: -amount})
+        print(f"Withdrew {amount} {currency}. New balance: {self.cash_by_currency()}")
+
+    def exchange_cash(self, amount: float, from_currency: str, to_currency: str) -> str:
+        """ Exchange cash from one currency into another at the current snapshot rate. """
+        from_currency, to_currency = from_currency.upper(), to_currency.upper()
+        if amount <= 0:
+            raise ValueError("Exchange amount must be positive.")
+        if from_currency == to_currency:
+            raise ValueError("Choose two different currencies to exchange between.")
+        if amount > self.cash_by_currency().get(from_currency, 0.0):
+            raise ValueError(f"Insufficient {from_currency} funds.")
+        fx = get_fx_snapshot()
+        rate = fx.rate(from_currency, to_currency)
+        # Both legs in one transaction, checked again against the stored cash
+        self.balance, self.cash = adjust_cash(self.name, {from_currency: -amount, to_currency: amount * rate})
+        write_log(self.name, "account", f"Exchanged {amount:,.2f} {from_currency} into {to_currency}")
+        return json.dumps({
+            "sold": {"currency": from_currency, "amount": amount},
+            "bought": {"currency": to_currency, "amount": amount * rate},
+            "rate": rate,
+            "rates_at": fx.timestamp,
+            "cash": self.cash_by_currency(),
+        })
 
     def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
         """ Buy shares of a stock if sufficient funds are available. """
@@ -87,16 +166,11 @@ class Account(BaseModel):
         elif price==0:
             raise ValueError(f"Unrecognized symbol {symbol}")
         
-        # Update holdings
-        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
+        timestamp = clock.now().strftime("%Y-%m-%d %H:%M:%S")
         transaction = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=rationale)
+        # Apply atomically against the stored account, which another process may have traded since it was read
+        self._apply(write_trade(self.name, transaction.model_dump()))
         self.transactions.append(transaction)
-        
-        # Update balance
-        self.balance -= total_cost
-        self.save()
         write_log(self.name, "account", f"Bought {quantity} of {symbol}")
         return "Completed. Latest details:\n" + self.report()
 
@@ -107,36 +181,140 @@ class Account(BaseModel):
         
         price = get_share_price(symbol)
         sell_price = price * (1 - SPREAD)
-        total_proceeds = sell_price * quantity
         
-        # Update holdings
-        self.holdings[symbol] -= quantity
-        
-        # If shares are completely sold, remove from holdings
-        if self.holdings[symbol] == 0:
-            del self.holdings[symbol]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
+        timestamp = clock.now().strftime("%Y-%m-%d %H:%M:%S")
         transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
+        # Apply atomically against the stored account, which another process may have traded since it was read
+        self._apply(write_trade(self.name, transaction.model_dump()))
         self.transactions.append(transaction)
-
-        # Update balance
-        self.balance += total_proceeds
-        self.save()
         write_log(self.name, "account", f"Sold {quantity} of {symbol}")
         return "Completed. Latest details:\n" + self.report()
 
-    def calculate_portfolio_value(self):
-        """ Calculate the total value of the user's portfolio. """
-        total_value = self.balance
-        for symbol, quantity in self.holdings.items():
-            total_value += get_share_price(symbol) * quantity
-        return total_value
+    def execute_orders(self, orders: list[Order], rationale: str) -> str:
+        """ Execute a basket of orders all-or-nothing: sells first, so their proceeds can fund the buys. """
+        if not orders:
+            raise ValueError("No orders given.")
+        prices = get_share_prices(list(dict.fromkeys(order.symbol for order in orders)))
+        problems = [f"unrecognized symbol {symbol}" for symbol, price in prices.items() if not price]
+        if problems:
+            raise ValueError("No orders executed: " + "; ".join(problems))
 
-    def calculate_profit_loss(self, portfolio_value: float):
-        """ Calculate profit or loss from the initial spend. """
-        initial_spend = sum(transaction.total() for transaction in self.transactions)
-        return portfolio_value - initial_spend - self.balance
+        timestamp = clock.now().strftime("%Y-%m-%d %H:%M:%S")
+        transactions = []
+        balance, holdings = self.balance, dict(self.holdings)
+        for order in sorted(orders, key=lambda order: order.action != "sell"):
+            price = prices[order.symbol]
+            if order.action == "sell":
+                quantity, price = -order.quantity, price * (1 - SPREAD)
+                if holdings.get(order.symbol, 0) < order.quantity:
+                    problems.append(f"not enough shares to sell {order.quantity} {order.symbol}")
+            else:
+                quantity, price = order.quantity, price * (1 + SPREAD)
+                if quantity * price > balance:
+                    problems.append(f"insufficient funds to buy {order.quantity} {order.symbol}")
+            holdings[order.symbol] = holdings.get(order.symbol, 0) + quantity
+            balance -= quantity * price
+            transactions.append(Transaction(symbol=order.symbol, quantity=quantity, price=price, timestamp=timestamp, rationale=rationale))
+        if problems:
+            raise ValueError("No orders executed: " + "; ".join(problems))
+
+        # One transaction for the whole basket, checked again against the stored account
+        for state in write_trades(self.name, [transaction.model_dump() for transaction in transactions]):
+            self._apply(state)
+        self.transactions.extend(transactions)
+        write_log(self.name, "account", f"Executed {len(transactions)} orders: " + ", ".join(repr(t) for t in transactions))
+        return json.dumps({
+            "executed": [{"symbol": t.symbol, "quantity": t.quantity, "price": round(t.price, 4)} for t in transactions],
+            "balance": self.balance,
+            "holdings": self.holdings,
+            "realized_pnl": self.realized_pnl,
+        })
+
+    def rebalance(self, target_weights: dict[str, float], execute: bool, rationale: str, tolerance: float = 0.0) -> str:
+        """ Work out (and optionally execute) the whole-share orders that move the portfolio to target weights. """
+        target_weights = {symbol.upper(): weight for symbol, weight in target_weights.items()}
+        if any(weight < 0 for weight in target_weights.values()) or sum(target_weights.values()) > 1 + 1e-9:
+            raise ValueError("Target weights must be non-negative and add up to at most 1; the rest is held as cash.")
+        # Holdings without a target weight are sold
+        symbols = list(dict.fromkeys([*self.holdings, *target_weights]))
+        prices = get_share_prices(symbols)
+        unknown = [symbol for symbol in symbols if not prices.get(symbol)]
+        if unknown:
+            raise ValueError(f"Unrecognized symbols {unknown}")
+
+        price_array = np.array([prices[symbol] for symbol in symbols])
+        holding_array = np.array([self.holdings.get(symbol, 0) for symbol in symbols])
+        weight_array = np.array([target_weights.get(symbol, 0.0) for symbol in symbols])
+        # Only ledger-currency cash can buy shares, but cash in other currencies still counts
+        # towards the total the weights are fractions of
+        fx = self.fx_snapshot()
+        other_cash = fx.convert(self.cash, LEDGER_CURRENCY) if fx else 0.0
+        deltas = plan_rebalance(holding_array, price_array, self.balance, weight_array, SPREAD, tolerance, other_cash)
+        orders = [
+            Order(symbol=symbol, action="buy" if delta > 0 else "sell", quantity=abs(int(delta)))
+            for symbol, delta in zip(symbols, deltas)
+            if delta
+        ]
+        if execute and orders:
+            return self.execute_orders(orders, rationale)
+
+        total = self.balance + other_cash + holding_array @ price_array
+        after = holding_array + deltas
+        return json.dumps({
+            "orders": [order.model_dump() for order in orders],
+            "weights_before": dict(zip(symbols, np.round(holding_array * price_array / total, 4).tolist())),
+            "weights_after": dict(zip(symbols, np.round(after * price_array / total, 4).tolist())),
+            "executed": False,
+        })
+
+    def cash_by_currency(self) -> dict[str, float]:
+        """ Report the cash held in each currency. """
+        return {LEDGER_CURRENCY: self.balance, **self.cash}
+
+    def value_by_currency(self, prices: dict[str, float]) -> dict[str, float]:
+        """ Total the cash and positions held in each currency; shares are priced in the ledger currency. """
+        values = self.cash_by_currency()
+        values[LEDGER_CURRENCY] += sum(prices[symbol] * quantity for symbol, quantity in self.holdings.items())
+        return values
+
+    def fx_snapshot(self, currency: str = LEDGER_CURRENCY) -> FxSnapshot | None:
+        """ The FX snapshot needed to value the account in currency, or None if it is all in that currency. """
+        if currency == LEDGER_CURRENCY and not self.cash:
+            return None
+        return get_fx_snapshot()
+
+    def calculate_portfolio_value(self, prices: dict[str, float] | None = None, currency: str = LEDGER_CURRENCY, fx: FxSnapshot | None = None):
+        """ Calculate the total value of the user's portfolio in the given currency. """
+        if prices is None:
+            prices = get_share_prices(self.holdings)
+        values = self.value_by_currency(prices)
+        fx = fx or self.fx_snapshot(currency)
+        if fx is None:
+            return values[LEDGER_CURRENCY]
+        # One conversion per currency held, not per position
+        return fx.convert(values, currency)
+
+    def calculate_profit_loss(self, prices: dict[str, float]):
+        """ Calculate total profit or loss on all trades, realized plus unrealized, in the ledger currency. """
+        return self.realized_pnl + self.calculate_unrealized_profit_loss(prices)
+
+    def calculate_unrealized_profit_loss(self, prices: dict[str, float]):
+        """ Calculate profit or loss on the shares still held, against their cost basis. """
+        return sum(prices[symbol] * quantity - self.cost_basis.get(symbol, 0.0) for symbol, quantity in self.holdings.items())
+
+    def get_positions(self, prices: dict[str, float]) -> dict[str, dict]:
+        """ Report quantity, average cost, market value and unrealized P&L for each holding. """
+        positions = {}
+        for symbol, quantity in self.holdings.items():
+            cost = self.cost_basis.get(symbol, 0.0)
+            value = prices[symbol] * quantity
+            positions[symbol] = {
+                "quantity": quantity,
+                "average_cost": cost / quantity,
+                "market_value": value,
+                "unrealized_pnl": value - cost,
+            }
+        return positions
 
     def get_holdings(self):
         """ Report the current holdings of the user. """
@@ -144,21 +322,45 @@ class Account(BaseModel):
 
     def get_profit_loss(self):
         """ Report the user's profit or loss at any point in time. """
-        return self.calculate_profit_loss()
+        return self.calculate_profit_loss(get_share_prices(self.holdings))
 
     def list_transactions(self):
         """ List all transactions made by the user. """
         return [transaction.model_dump() for transaction in self.transactions]
     
-    def report(self) -> str:
-        """ Return a json string representing the account.  """
-        portfolio_value = self.calculate_portfolio_value()
-        self.portfolio_value_time_series.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
-        self.save()
-        pnl = self.calculate_profit_loss(portfolio_value)
+    def record_portfolio_value(self, prices: dict[str, float] | None = None, fx: FxSnapshot | None = None) -> float:
+        """ Value the portfolio now and append it to the time series, returning the value. """
+        # The recorded history stays in the ledger currency and is converted when read
+        portfolio_value = self.calculate_portfolio_value(prices, fx=fx)
+        point = (clock.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value)
+        self.portfolio_value_time_series.append(point)
+        write_portfolio_value(self.name, *point)
+        return portfolio_value
+
+    def report(self, currency: str = LEDGER_CURRENCY) -> str:
+        """
+        Return a json string representing the account. Its value, P&L and value history are
+        given in currency; cash, positions and cost basis stay in the currency they are held in.
+        """
+        currency = currency.upper()
+        if currency not in SUPPORTED_CURRENCIES:
+            raise ValueError(f"Currency {currency} is not supported")
+        prices = get_share_prices(self.holdings)
+        fx = self.fx_snapshot(currency)
+        portfolio_value = self.record_portfolio_value(prices, fx)
+        unrealized_pnl = self.calculate_unrealized_profit_loss(prices)
         data = self.model_dump()
-        data["total_portfolio_value"] = portfolio_value
-        data["total_profit_loss"] = pnl
+        data["positions"] = self.get_positions(prices)
+        rate = fx.rate(LEDGER_CURRENCY, currency) if fx else 1.0
+        data["currency"] = currency
+        data["total_portfolio_value"] = portfolio_value * rate
+        data["realized_profit_loss"] = self.realized_pnl * rate
+        data["unrealized_profit_loss"] = unrealized_pnl * rate
+        data["total_profit_loss"] = (self.realized_pnl + unrealized_pnl) * rate
+        if currency != LEDGER_CURRENCY:
+            data["portfolio_value_time_series"] = revalue(self.portfolio_value_time_series, currency)
+        if fx:
+            data["fx_rates_at"] = fx.timestamp
         write_log(self.name, "account", f"Retrieved account details")
         return json.dumps(data)
     
@@ -170,7 +372,7 @@ class Account(BaseModel):
     def change_strategy(self, strategy: str) -> str:
         """ At your discretion, if you choose to, call this to change your investment strategy for the future """
         self.strategy = strategy
-        self.save()
+        update_account(self.name, strategy=strategy)
         write_log(self.name, "account", f"Changed strategy")
         return "Changed strategy"
 
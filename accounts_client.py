@@ -1,40 +1,89 @@
-import mcp
-from mcp.client.stdio import stdio_client
 from mcp import StdioServerParameters
 from agents import FunctionTool
+from dotenv import load_dotenv
+from session_pool import SessionPool
+import asyncio
 import json
+import os
+import threading
 
-# Set up server parameters to launch accounts_server.py via uv
-params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=None)
+load_dotenv(override=True)
+
+# Connect to the shared accounts service if ACCOUNTS_SERVER_URL is set, else launch accounts_server.py via uv
+params = os.getenv("ACCOUNTS_SERVER_URL") or StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=None)
+
+# Number of accounts_server sessions kept warm for resource reads and tool calls
+ACCOUNTS_POOL_SIZE = int(os.getenv("ACCOUNTS_POOL_SIZE", "2"))
+
+_pool: SessionPool | None = None
+_pool_loop = None
+
+
+def get_accounts_pool() -> SessionPool:
+    """Return the session pool for the running event loop, creating it on first use."""
+    global _pool, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool_loop is not loop:
+        if _pool is not None:
+            _close_on_loop(_pool, _pool_loop)
+        _pool, _pool_loop = SessionPool(params, ACCOUNTS_POOL_SIZE), loop
+    return _pool
+
+
+def _close_on_loop(pool: SessionPool, loop: asyncio.AbstractEventLoop) -> None:
+    """Close a pool left behind by another event loop; its sessions can only be closed on that loop."""
+    if loop.is_closed():
+        # Shutting the loop down cancelled the sessions' owner tasks, which closed their servers
+        return
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(pool.close(), loop)
+    else:
+        # This thread is already running a loop, so the idle one is run to completion on another
+        threading.Thread(target=loop.run_until_complete, args=(pool.close(),), daemon=True).start()
+
+
+async def close_accounts_pool():
+    """Close the pooled accounts sessions and their servers."""
+    global _pool, _pool_loop
+    if _pool is not None:
+        pool, loop = _pool, _pool_loop
+        _pool, _pool_loop = None, None
+        if loop is asyncio.get_running_loop():
+            await pool.close()
+        else:
+            _close_on_loop(pool, loop)
 
 
 async def list_accounts_tools():
-    async with stdio_client(params) as streams:  # Create stdio connection to MCP server
-        async with mcp.ClientSession(*streams) as session:  # Initialize client session
-            await session.initialize()  # Complete MCP handshake
-            tools_result = await session.list_tools()  # Get available tools from server
-            return tools_result.tools
+    async def list_tools(session):
+        tools_result = await session.list_tools()  # Get available tools from server
+        return tools_result.tools
+    return await get_accounts_pool().run(list_tools)  # One round trip on a warm session
         
 async def call_accounts_tool(tool_name, tool_args):
-    async with stdio_client(params) as streams:  # Create stdio connection to MCP server
-        async with mcp.ClientSession(*streams) as session:  # Initialize client session
-            await session.initialize()  # Complete MCP handshake
-            result = await session.call_tool(tool_name, tool_args)  # Execute tool with arguments
-            return result
+    return await get_accounts_pool().run(lambda session: session.call_tool(tool_name, tool_args))  # Execute tool with arguments
             
+async def record_portfolio_value(name):
+    result = await call_accounts_tool("record_portfolio_value", {"name": name})  # Value the account and record the point
+    return float(result.content[0].text)
+
 async def read_accounts_resource(name):
-    async with stdio_client(params) as streams:  # Create stdio connection to MCP server
-        async with mcp.ClientSession(*streams) as session:  # Initialize client session
-            await session.initialize()  # Complete MCP handshake
-            result = await session.read_resource(f"accounts://accounts_server/{name}")  # Read resource by URI
-            return result.contents[0].text  # Extract text content from resource
+    async def read(session):
+        result = await session.read_resource(f"accounts://accounts_server/{name}")  # Read resource by URI
+        return result.contents[0].text  # Extract text content from resource
+    return await get_accounts_pool().run(read)
         
+async def read_account_view_resource(name):
+    async def read(session):
+        result = await session.read_resource(f"accounts://view/{name}")  # Read-only account view, no pricing or writes
+        return result.contents[0].text  # Extract text content from resource
+    return await get_accounts_pool().run(read)
+
 async def read_strategy_resource(name):
-    async with stdio_client(params) as streams:  # Create stdio connection to MCP server
-        async with mcp.ClientSession(*streams) as session:  # Initialize client session
-            await session.initialize()  # Complete MCP handshake
-            result = await session.read_resource(f"accounts://strategy/{name}")  # Read strategy resource by URI
-            return result.contents[0].text  # Extract text content from resource
+    async def read(session):
+        result = await session.read_resource(f"accounts://strategy/{name}")  # Read strategy resource by URI
+        return result.contents[0].text  # Extract text content from resource
+    return await get_accounts_pool().run(read)
 
 async def get_accounts_tools_openai(): # This function converts MCP tools to OpenAI-compatible tools
     openai_tools = [] # This list will store the OpenAI-compatible tools
@@ -1,16 +1,29 @@
 from mcp.server.fastmcp import FastMCP
-from accounts import Account
+from accounts import Account, Order
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import os
 
-mcp = FastMCP("accounts_server")
+load_dotenv(override=True)
+
+# Where the shared accounts service listens when run with an HTTP transport
+ACCOUNTS_HOST = os.getenv("ACCOUNTS_HOST", "127.0.0.1")
+ACCOUNTS_PORT = int(os.getenv("ACCOUNTS_PORT", "8010"))
+
+mcp = FastMCP("accounts_server", host=ACCOUNTS_HOST, port=ACCOUNTS_PORT)
+
+# Account calls block on SQLite and price lookups, so they run on worker threads, letting one
+# HTTP service handle every trader and the dashboard concurrently
 
 @mcp.tool()
 async def get_balance(name: str) -> float:
-    """Get the cash balance of the given account name.
+    """Get the cash balance of the given account name, in US dollars.
 
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).balance
+    return await asyncio.to_thread(lambda: Account.get(name).balance)
 
 @mcp.tool()
 async def get_holdings(name: str) -> dict[str, int]:
@@ -19,7 +32,18 @@ async def get_holdings(name: str) -> dict[str, int]:
     Args:
         name: The name of the account holder
     """
-    return Account.get(name).holdings
+    return await asyncio.to_thread(lambda: Account.get(name).holdings)
+
+@mcp.tool()
+async def get_account(name: str, fields: list[str] | None = None, last_transactions: int = 10) -> str:
+    """Read an account without changing anything. Cheaper than the full account report.
+
+    Args:
+        name: The name of the account holder
+        fields: Any of balance, cash (held in currencies other than US dollars), strategy, holdings, cost_basis, realized_pnl, transactions, portfolio_value (the latest recorded valuation); all of them if omitted
+        last_transactions: How many of the most recent transactions to include
+    """
+    return await asyncio.to_thread(Account.view, name, fields, last_transactions)
 
 @mcp.tool()
 async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
@@ -31,7 +55,7 @@ async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> f
         quantity: The quantity of shares to buy
         rationale: The rationale for the purchase and fit with the account's strategy
     """
-    return Account.get(name).buy_shares(symbol, quantity, rationale)
+    return await asyncio.to_thread(lambda: Account.get(name).buy_shares(symbol, quantity, rationale))
 
 
 @mcp.tool()
@@ -44,7 +68,60 @@ async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) ->
         quantity: The quantity of shares to sell
         rationale: The rationale for the sale and fit with the account's strategy
     """
-    return Account.get(name).sell_shares(symbol, quantity, rationale)
+    return await asyncio.to_thread(lambda: Account.get(name).sell_shares(symbol, quantity, rationale))
+
+@mcp.tool()
+async def execute_orders(name: str, orders: list[Order], rationale: str) -> str:
+    """Buy and sell several stocks in one step. The whole basket is validated against your cash
+    and holdings and executed together, or not at all; sells execute first so their proceeds
+    can fund the buys. Prefer this to repeated buy_shares and sell_shares calls.
+
+    Args:
+        name: The name of the account holder
+        orders: The orders, each with a symbol, an action (buy or sell) and a quantity of shares
+        rationale: The rationale for these trades and fit with the account's strategy
+    """
+    return await asyncio.to_thread(lambda: Account.get(name).execute_orders(orders, rationale))
+
+@mcp.tool()
+async def rebalance(name: str, target_weights: dict[str, float], execute: bool, rationale: str, tolerance: float = 0.0) -> str:
+    """Rebalance the portfolio to target weights in one step. Computes the whole-share buys and
+    sells that bring each position to its target fraction of the total portfolio value, after
+    the spread and within your US dollar cash; cash in other currencies counts towards the total
+    but is not spent. Holdings left out of target_weights are sold. Call with
+    execute=false to preview the orders, or execute=true to carry them out together.
+
+    Args:
+        name: The name of the account holder
+        target_weights: Target fraction of portfolio value per symbol, e.g. {"SPY": 0.6, "TLT": 0.3}; the rest stays in cash
+        execute: False to only preview the orders, true to execute them
+        rationale: The rationale for the rebalance and fit with the account's strategy
+        tolerance: Leave positions alone that are already within this many weight points of target, e.g. 0.02; holdings left out of target_weights are still sold
+    """
+    return await asyncio.to_thread(lambda: Account.get(name).rebalance(target_weights, execute, rationale, tolerance))
+
+@mcp.tool()
+async def exchange_cash(name: str, amount: float, from_currency: str, to_currency: str) -> str:
+    """Exchange cash from one currency into another at the current exchange rate. Shares are
+    bought and sold in US dollars (USD).
+
+    Args:
+        name: The name of the account holder
+        amount: The amount of from_currency to exchange
+        from_currency: The currency to sell, e.g. EUR
+        to_currency: The currency to buy, e.g. USD
+    """
+    return await asyncio.to_thread(lambda: Account.get(name).exchange_cash(amount, from_currency, to_currency))
+
+@mcp.tool()
+async def record_portfolio_value(name: str) -> float:
+    """Value the portfolio at current prices and record it in the account's history. The trading
+    floor calls this once per cycle; there is no need to call it yourself.
+
+    Args:
+        name: The name of the account holder
+    """
+    return await asyncio.to_thread(lambda: Account.get(name).record_portfolio_value())
 
 @mcp.tool()
 async def change_strategy(name: str, strategy: str) -> str:
@@ -54,17 +131,31 @@ async def change_strategy(name: str, strategy: str) -> str:
         name: The name of the account holder
         strategy: The new strategy for the account
     """
-    return Account.get(name).change_strategy(strategy)
+    return await asyncio.to_thread(lambda: Account.get(name).change_strategy(strategy))
 
 @mcp.resource("accounts://accounts_server/{name}")
 async def read_account_resource(name: str) -> str:
-    account = Account.get(name.lower())
-    return account.report()
+    return await asyncio.to_thread(lambda: Account.get(name.lower()).report())
+
+@mcp.resource("accounts://accounts_server/{name}/{currency}")
+async def read_account_in_currency_resource(name: str, currency: str) -> str:
+    return await asyncio.to_thread(lambda: Account.get(name.lower()).report(currency))
+
+@mcp.resource("accounts://view/{name}")
+async def read_account_view_resource(name: str) -> str:
+    return await asyncio.to_thread(Account.view, name)
 
 @mcp.resource("accounts://strategy/{name}")
 async def read_strategy_resource(name: str) -> str:
-    account = Account.get(name.lower())
-    return account.get_strategy()
+    return await asyncio.to_thread(lambda: Account.get(name.lower()).get_strategy())
 
 if __name__ == "__main__":
-    mcp.run(transport='stdio')
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Accounts MCP server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "streamable-http", "sse"],
+        default="stdio",
+        help="stdio for a private per-client process, or an HTTP transport for one shared service",
+    )
+    args = parser.parse_args()
+    mcp.run(transport=args.transport)
@@ -4,7 +4,15 @@ import pandas as pd
 from trading_floor import names, lastnames, short_model_names
 import plotly.express as px
 from accounts import Account
-from database import read_log, read_log_prioritized, read_mcp_tool_logs
+from database import read_log, read_log_prioritized, read_mcp_tool_logs, read_portfolio_values, LEDGER_CURRENCY
+from fx import revalue
+from market import get_share_prices
+import os
+
+# Upper bound on points plotted per chart; older history comes back at hourly or daily resolution
+CHART_MAX_POINTS = 500
+# Currency the dashboard shows portfolio values and P&L in
+DASHBOARD_CURRENCY = os.getenv("DASHBOARD_CURRENCY", LEDGER_CURRENCY).upper()
 
 mapper = {
     "trace": Color.WHITE,
@@ -34,7 +42,8 @@ class Trader:
         return self.account.get_strategy()
 
     def get_portfolio_value_df(self) -> pd.DataFrame:
-        df = pd.DataFrame(self.account.portfolio_value_time_series, columns=["datetime", "value"])
+        series = revalue(read_portfolio_values(self.name, resolution="auto", max_points=CHART_MAX_POINTS), DASHBOARD_CURRENCY)
+        df = pd.DataFrame(series, columns=["datetime", "value"])
         df["datetime"] = pd.to_datetime(df["datetime"])
         return df
 
@@ -58,10 +67,14 @@ class Trader:
         """Convert holdings to DataFrame for display"""
         holdings = self.account.get_holdings()
         if not holdings:
-            return pd.DataFrame(columns=["Symbol", "Quantity"])
+            return pd.DataFrame(columns=["Symbol", "Quantity", "Avg Cost"])
 
+        cost_basis = self.account.cost_basis
         df = pd.DataFrame(
-            [{"Symbol": symbol, "Quantity": quantity} for symbol, quantity in holdings.items()]
+            [
+                {"Symbol": symbol, "Quantity": quantity, "Avg Cost": round(cost_basis.get(symbol, 0.0) / quantity, 2)}
+                for symbol, quantity in holdings.items()
+            ]
         )
         return df
 
@@ -75,11 +88,14 @@ class Trader:
 
     def get_portfolio_value(self) -> str:
         """Calculate total portfolio value based on current prices"""
-        portfolio_value = self.account.calculate_portfolio_value() or 0.0
-        pnl = self.account.calculate_profit_loss(portfolio_value) or 0.0
+        prices = get_share_prices(self.account.holdings)
+        fx = self.account.fx_snapshot(DASHBOARD_CURRENCY)
+        portfolio_value = self.account.calculate_portfolio_value(prices, DASHBOARD_CURRENCY, fx) or 0.0
+        pnl = self.account.calculate_profit_loss(prices) * (fx.rate(LEDGER_CURRENCY, DASHBOARD_CURRENCY) if fx else 1.0)
         color = "green" if pnl >= 0 else "red"
         emoji = "⬆" if pnl >= 0 else "⬇"
-        return f"<div style='text-align: center;background-color:{color};'><span style='font-size:32px'>${portfolio_value:,.0f}</span><span style='font-size:24px'>&nbsp;&nbsp;&nbsp;{emoji}&nbsp;${pnl:,.0f}</span></div>"
+        unit = "$" if DASHBOARD_CURRENCY == "USD" else f"{DASHBOARD_CURRENCY} "
+        return f"<div style='text-align: center;background-color:{color};'><span style='font-size:32px'>{unit}{portfolio_value:,.0f}</span><span style='font-size:24px'>&nbsp;&nbsp;&nbsp;{emoji}&nbsp;{unit}{pnl:,.0f}</span></div>"
 
     def get_logs(self, previous=None) -> str:
         logs = read_log_prioritized(self.name, last_n=13)
@@ -144,7 +160,7 @@ class TraderView:
                 self.holdings_table = gr.Dataframe(
                     value=self.trader.get_holdings_df(),
                     label="Holdings",
-                    headers=["Symbol", "Quantity"],
+                    headers=["Symbol", "Quantity", "Avg Cost"],
                     row_count=(5, "dynamic")
                 )
             with gr.Row():
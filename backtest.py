@@ -0,0 +1,165 @@
+"""
+Replay stored daily market snapshots through simple rule-based strategies on a simulated clock.
+
+Each backtest writes to its own database file, so live accounts are never touched, and
+independent backtests run in parallel on a process pool.
+
+    uv run backtest.py --start 2025-01-01 --end 2025-06-30 --symbols SPY,QQQ,IWM --workers 2
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, time as day_time
+import argparse
+import os
+import time
+
+import clock
+import database
+from accounts import Account, INITIAL_BALANCE
+from market import get_share_prices
+
+# Trades are priced at the close of each simulated day
+SIMULATED_TIME_OF_DAY = day_time(16, 0)
+
+
+class Strategy:
+    """A non-LLM trading rule: given an account and today's prices, return orders."""
+
+    name = "strategy"
+
+    def __init__(self, symbols: list[str]):
+        self.symbols = symbols
+
+    def decide(self, account: Account, prices: dict[str, float], date: str) -> list[tuple[str, int]]:
+        """Return (symbol, quantity) orders: positive quantities buy, negative sell."""
+        raise NotImplementedError
+
+
+class BuyAndHold(Strategy):
+    """Spend the cash equally across the symbols on the first day, then hold."""
+
+    name = "buy_and_hold"
+
+    def decide(self, account, prices, date):
+        if account.holdings:
+            return []
+        tradable = [symbol for symbol in self.symbols if prices.get(symbol)]
+        budget = account.balance / max(len(tradable), 1) / 1.01
+        return [(symbol, int(budget // prices[symbol])) for symbol in tradable if budget >= prices[symbol]]
+
+
+class Momentum(Strategy):
+    """Hold whichever symbol rose most over the lookback window, switching when the leader changes."""
+
+    name = "momentum"
+
+    def __init__(self, symbols: list[str], lookback: int = 20):
+        super().__init__(symbols)
+        self.lookback = lookback
+        self.history: dict[str, list[float]] = {symbol: [] for symbol in symbols}
+
+    def decide(self, account, prices, date):
+        for symbol in self.symbols:
+            if prices.get(symbol):
+                self.history[symbol] = (self.history[symbol] + [prices[symbol]])[-self.lookback:]
+        ready = {s: h for s, h in self.history.items() if len(h) == self.lookback and prices.get(s)}
+        if not ready:
+            return []
+        leader = max(ready, key=lambda s: ready[s][-1] / ready[s][0])
+        orders = [(symbol, -quantity) for symbol, quantity in account.holdings.items() if symbol != leader]
+        if leader not in account.holdings:
+            cash = account.balance + sum(prices.get(s, 0.0) * q for s, q in account.holdings.items() if s != leader)
+            orders.append((leader, int(cash / 1.01 // prices[leader])))
+        return [(symbol, quantity) for symbol, quantity in orders if quantity]
+
+
+STRATEGIES = {cls.name: cls for cls in (BuyAndHold, Momentum)}
+
+
+@dataclass
+class BacktestJob:
+    strategy: str
+    symbols: list[str]
+    start: str
+    end: str
+    db_path: str
+    source_db: str = database.DB
+    names: list[str] = field(default_factory=lambda: ["backtest"])
+
+
+def run_backtest(job: BacktestJob) -> dict:
+    """Run one backtest in this process and summarize how each account finished."""
+    database.use_database(job.db_path)
+    database.import_market(os.path.abspath(job.source_db), job.start, job.end)
+    dates = [date for date in database.read_market_dates() if job.start <= date <= job.end]
+    strategies = {name: STRATEGIES[job.strategy](job.symbols) for name in job.names}
+    for name in job.names:
+        Account.get(name).reset(f"Backtest of {job.strategy}")
+
+    started = time.perf_counter()
+    trades = 0
+    try:
+        for date in dates:
+            clock.set_simulated_time(datetime.combine(datetime.fromisoformat(date).date(), SIMULATED_TIME_OF_DAY))
+            prices = get_share_prices(job.symbols)
+            for name, strategy in strategies.items():
+                account = Account.get(name)
+                for symbol, quantity in strategy.decide(account, prices, date):
+                    try:
+                        if quantity > 0:
+                            account.buy_shares(symbol, quantity, strategy.name)
+                        else:
+                            account.sell_shares(symbol, -quantity, strategy.name)
+                        trades += 1
+                    except ValueError as e:
+                        print(f"{date} {name}: skipped {symbol} {quantity}: {e}")
+                account.report()
+    finally:
+        clock.set_simulated_time(None)
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in job.names:
+        series = Account.get(name).portfolio_value_time_series
+        final = series[-1][1] if series else INITIAL_BALANCE
+        results[name] = {"final_value": final, "return": final / INITIAL_BALANCE - 1}
+    database.close_connections()
+    return {
+        "strategy": job.strategy,
+        "db_path": job.db_path,
+        "days": len(dates),
+        "trades": trades,
+        "cycles_per_second": len(dates) / elapsed if elapsed else 0.0,
+        "accounts": results,
+    }
+
+
+def run_backtests(jobs: list[BacktestJob], workers: int = os.cpu_count() or 1) -> list[dict]:
+    """Run independent backtests in parallel, one process per backtest."""
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        return list(executor.map(run_backtest, jobs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", required=True)
+    parser.add_argument("--symbols", required=True, help="comma-separated symbols to trade")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="comma-separated strategy names")
+    parser.add_argument("--out", default="backtests", help="directory for the backtest databases")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    symbols = [s.strip().upper() for s in args.symbols.split(",")]
+    jobs = [
+        BacktestJob(name, symbols, args.start, args.end, os.path.join(args.out, f"{name}_{args.start}_{args.end}.db"))
+        for name in args.strategies.split(",")
+    ]
+    for result in run_backtests(jobs, args.workers):
+        print(
+            f"{result['strategy']}: {result['days']} days, {result['trades']} trades, "
+            f"{result['cycles_per_second']:,.0f} cycles/sec -> {result['db_path']}"
+        )
+        for name, summary in result["accounts"].items():
+            print(f"  {name}: ${summary['final_value']:,.2f} ({summary['return']:+.1%})")
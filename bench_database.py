@@ -0,0 +1,186 @@
+"""
+Benchmark the database layer: a fresh connection and commit per call (the old behaviour)
+against the pooled WAL connections in database.py, and the dashboard's log queries
+against a large logs table before and after indexing.
+
+Runs against throwaway files in a temporary directory, never accounts.db.
+
+    uv run bench_database.py [--ops 2000] [--log-rows 1000000]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import database
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)',
+    '''CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        datetime DATETIME,
+        type TEXT,
+        message TEXT
+    )''',
+]
+
+TRADERS = ["warren", "george", "ray", "cathie"]
+LOG_TYPES = ["trace", "agent", "function", "generation", "response", "mcp_tool", "account"]
+
+LEGACY_LOG_QUERIES = {
+    "read_log": '''
+        SELECT datetime, type, message FROM logs
+        WHERE name = ?
+        ORDER BY datetime DESC
+        LIMIT ?
+    ''',
+    "account logs": '''
+        SELECT datetime, type, message FROM logs
+        WHERE name = ? AND type = 'account'
+        ORDER BY datetime DESC
+        LIMIT ?
+    ''',
+    "other logs": '''
+        SELECT datetime, type, message FROM logs
+        WHERE name = ? AND type != 'account'
+        ORDER BY datetime DESC
+        LIMIT ?
+    ''',
+    "mcp_tool logs": '''
+        SELECT datetime, type, message FROM logs
+        WHERE name = ? AND type = 'mcp_tool'
+        ORDER BY datetime DESC
+        LIMIT ?
+    ''',
+}
+
+ACCOUNT = {"name": "bench", "balance": 10_000.0, "strategy": "", "holdings": {"AAPL": 5},
+           "transactions": [], "portfolio_value_time_series": []}
+
+
+def legacy_write_log(path, name, type, message):
+    with sqlite3.connect(path) as conn:
+        conn.execute('''
+            INSERT INTO logs (name, datetime, type, message)
+            VALUES (?, datetime('now'), ?, ?)
+        ''', (name, type, message))
+        conn.commit()
+
+
+def legacy_write_account(path, name, account_dict):
+    with sqlite3.connect(path) as conn:
+        conn.execute('''
+            INSERT INTO accounts (name, account)
+            VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET account=excluded.account
+        ''', (name, json.dumps(account_dict)))
+        conn.commit()
+
+
+def legacy_read_account(path, name):
+    with sqlite3.connect(path) as conn:
+        row = conn.execute('SELECT account FROM accounts WHERE name = ?', (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def timed(label, ops, fn):
+    start = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    rate = ops / elapsed
+    print(f"  {label:<16} {rate:>12,.0f} ops/sec")
+    return rate
+
+
+def run(ops: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        with sqlite3.connect(legacy_db) as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+        print(f"Connection per call ({ops} ops each)")
+        before = [
+            timed("write_log", ops, lambda i: legacy_write_log(legacy_db, "bench", "trace", f"span {i}")),
+            timed("write_account", ops, lambda i: legacy_write_account(legacy_db, "bench", ACCOUNT)),
+            timed("read_account", ops, lambda i: legacy_read_account(legacy_db, "bench")),
+        ]
+
+        database.use_database(os.path.join(tmp, "pooled.db"))
+        print(f"Pooled WAL connections ({ops} ops each)")
+        after = [
+            timed("write_log", ops, lambda i: database.write_log("bench", "trace", f"span {i}")),
+            timed("write_account", ops, lambda i: database.write_account("bench", ACCOUNT)),
+            timed("read_account", ops, lambda i: database.read_account("bench")),
+        ]
+        database.close_connections()
+
+        print("Speedup")
+        for label, b, a in zip(["write_log", "write_account", "read_account"], before, after):
+            print(f"  {label:<16} {a / b:>11.1f}x")
+
+
+def fill_logs(path: str, rows: int) -> None:
+    """Bulk load an unindexed logs table with a realistic mix of traders and log types."""
+    rng = random.Random(0)
+    batch = 50_000
+    with sqlite3.connect(path) as conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        for start in range(0, rows, batch):
+            conn.executemany(
+                "INSERT INTO logs (name, datetime, type, message) VALUES (?, datetime('now'), ?, ?)",
+                [
+                    (rng.choice(TRADERS), rng.choices(LOG_TYPES, weights=[5, 5, 5, 5, 5, 4, 1])[0], f"message {i}")
+                    for i in range(start, min(start + batch, rows))
+                ],
+            )
+        conn.commit()
+
+
+def run_logs(rows: int, ops: int) -> None:
+    legacy_ops = max(1, ops // 100)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "logs.db")
+        print(f"Loading {rows:,} log rows")
+        fill_logs(path, rows)
+
+        print(f"Unindexed, ORDER BY datetime ({legacy_ops} dashboard refreshes each)")
+        conn = sqlite3.connect(path)
+        before = {
+            label: timed(label, legacy_ops, lambda i: conn.execute(sql, (TRADERS[i % 4], 13)).fetchall())
+            for label, sql in LEGACY_LOG_QUERIES.items()
+        }
+        conn.close()
+
+        start = time.perf_counter()
+        database.use_database(path)
+        print(f"Index build took {time.perf_counter() - start:.1f}s")
+        print(f"Indexed, ORDER BY datetime, id ({ops} dashboard refreshes each)")
+        after = {
+            "read_log": timed("read_log", ops, lambda i: list(database.read_log(TRADERS[i % 4], 13))),
+            "prioritized": timed("prioritized", ops, lambda i: database.read_log_prioritized(TRADERS[i % 4], 13)),
+            "mcp_tool logs": timed("mcp_tool logs", ops, lambda i: list(database.read_mcp_tool_logs(TRADERS[i % 4], 13))),
+        }
+        database.close_connections()
+
+        # read_log_prioritized used to run the account and other queries back to back
+        before["prioritized"] = 1 / (1 / before.pop("account logs") + 1 / before.pop("other logs"))
+        print("Speedup")
+        for label in after:
+            print(f"  {label:<16} {after[label] / before[label]:>11.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--log-rows", type=int, default=0, help="also benchmark log queries over this many rows")
+    args = parser.parse_args()
+    run(args.ops)
+    if args.log_rows:
+        run_logs(args.log_rows, args.ops)
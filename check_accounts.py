@@ -1,9 +1,12 @@
 from accounts import Account
+from database import read_account
 
 for name in ['Warren', 'George', 'Ray', 'Cathie']:
     account = Account.get(name)
     portfolio_value = account.calculate_portfolio_value() or 0
-    transactions = account.list_transactions()
+    # Account.get holds only recent history, so count the full ledger
+    ledger = read_account(name)
+    transactions = ledger["transactions"]
     holdings = account.get_holdings()
     
     print(f"{name}:")
@@ -11,8 +14,8 @@ for name in ['Warren', 'George', 'Ray', 'Cathie']:
     print(f"  Portfolio Value: ${portfolio_value:.2f}")
     print(f"  Transactions: {len(transactions)}")
     print(f"  Holdings: {len(holdings) if holdings else 0}")
-    print(f"  Portfolio History Points: {len(account.portfolio_value_time_series)}")
+    print(f"  Portfolio History Points: {len(ledger['portfolio_value_time_series'])}")
     
-    if len(account.portfolio_value_time_series) > 0:
-        print(f"  Latest Portfolio Value: {account.portfolio_value_time_series[-1]}")
+    if len(ledger["portfolio_value_time_series"]) > 0:
+        print(f"  Latest Portfolio Value: {ledger['portfolio_value_time_series'][-1]}")
     print()
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+# When set, the process runs on simulated time (backtests) instead of the wall clock
+_simulated: datetime | None = None
+
+
+def now() -> datetime:
+    return _simulated or datetime.now()
+
+
+def is_simulated() -> bool:
+    return _simulated is not None
+
+
+def set_simulated_time(when: datetime | None) -> None:
+    """Move the simulated clock to when, or return to wall-clock time with None."""
+    global _simulated
+    _simulated = when
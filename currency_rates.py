@@ -1,113 +1,237 @@
-import requests
+import httpx
+import asyncio
+import numpy as np
 import json
+import time
 from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
+from dotenv import load_dotenv
 import os
 
+load_dotenv(override=True)
+
+# How long one /latest/{base} response is reused for every pair with that base
+CURRENCY_CACHE_TTL_SECONDS = float(os.getenv("CURRENCY_CACHE_TTL_SECONDS", "600"))
+CURRENCY_HTTP_TIMEOUT = float(os.getenv("CURRENCY_HTTP_TIMEOUT", "5"))
+# After a failed fetch, calls skip the API and use fallback data for this long
+CURRENCY_FAILURE_TTL_SECONDS = float(os.getenv("CURRENCY_FAILURE_TTL_SECONDS", "30"))
+# Every cross rate is triangulated from this one base currency's quotes
+MATRIX_BASE = "USD"
+
+
 class CurrencyExchangeService:
-    def __init__(self):
+    def __init__(self, ttl_seconds: float = CURRENCY_CACHE_TTL_SECONDS, failure_ttl_seconds: float = CURRENCY_FAILURE_TTL_SECONDS):
         self.api_key = os.getenv('EXCHANGE_API_KEY')
         self.base_url = "https://api.exchangerate-api.io/v4/latest"
+        self.ttl_seconds = ttl_seconds
+        self.failure_ttl_seconds = failure_ttl_seconds
         self.fallback_rates = {
             'USD': {
-                'EUR': 0.85, 'GBP': 0.73, 'JPY': 110.0, 'CAD': 1.25, 
+                'EUR': 0.85, 'GBP': 0.73, 'JPY': 110.0, 'CAD': 1.25,
                 'AUD': 1.35, 'CHF': 0.92, 'CNY': 6.45, 'INR': 75.0
-            },
-            'EUR': {
-                'USD': 1.18, 'GBP': 0.86, 'JPY': 129.5, 'CAD': 1.47,
-                'AUD': 1.59, 'CHF': 1.08, 'CNY': 7.59, 'INR': 88.2
             }
         }
         self.supported_currencies = ['USD', 'EUR', 'GBP', 'JPY', 'CAD', 'AUD', 'CHF', 'CNY', 'INR']
-    
-    def _get_fallback_rate(self, from_currency: str, to_currency: str) -> float:
-        if from_currency == to_currency:
-            return 1.0
-        
-        if from_currency in self.fallback_rates and to_currency in self.fallback_rates[from_currency]:
-            return self.fallback_rates[from_currency][to_currency]
-        elif to_currency in self.fallback_rates and from_currency in self.fallback_rates[to_currency]:
-            return 1.0 / self.fallback_rates[to_currency][from_currency]
-        else:
-            raise ValueError(f"Exchange rate not available for {from_currency} to {to_currency}")
-    
-    def get_exchange_rate(self, from_currency: str, to_currency: str, amount: float = 1.0) -> Dict:
-        from_currency = from_currency.upper()
-        to_currency = to_currency.upper()
-        
-        if from_currency not in self.supported_currencies:
-            raise ValueError(f"Currency {from_currency} is not supported")
-        if to_currency not in self.supported_currencies:
-            raise ValueError(f"Currency {to_currency} is not supported")
-        
+        self._index = {currency: i for i, currency in enumerate(self.supported_currencies)}
+        self._fallback_matrix = self._cross_rates(self.fallback_rates[MATRIX_BASE])
+        # (matrix, fetched_at, source, the base rates it was built from), replaced as a whole on refresh
+        self._matrix: Optional[tuple[np.ndarray, datetime, str, Optional[Dict[str, float]]]] = None
+        # base currency -> (monotonic fetch time, wall-clock fetch time, rates)
+        self._cache: Dict[str, tuple[float, datetime, Dict[str, float]]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # base currency -> monotonic time of its last failed fetch
+        self._failed_at: Dict[str, float] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop = None
+        self.stats = {"api_fetches": 0, "api_errors": 0, "cache_hits": 0, "coalesced": 0, "stale": 0, "fallbacks": 0, "failures_cached": 0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """One pooled client per event loop, since an AsyncClient cannot be shared across loops."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(timeout=CURRENCY_HTTP_TIMEOUT)
+            self._client_loop = loop
+            self._inflight = {}
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(self, base: str) -> Optional[Dict[str, float]]:
         try:
-            url = f"{self.base_url}/{from_currency}"
-            response = requests.get(url, timeout=5)
-            
+            response = await self._get_client().get(f"{self.base_url}/{base}")
             if response.status_code == 200:
                 data = response.json()
-                if 'rates' in data and to_currency in data['rates']:
-                    rate = data['rates'][to_currency]
-                    converted_amount = amount * rate
-                    return {
-                        'from_currency': from_currency,
-                        'to_currency': to_currency,
-                        'rate': rate,
-                        'amount': amount,
-                        'converted_amount': converted_amount,
-                        'timestamp': datetime.now().isoformat(),
-                        'source': 'api'
-                    }
+                if 'rates' in data:
+                    self.stats["api_fetches"] += 1
+                    rates = {currency: float(rate) for currency, rate in data['rates'].items()}
+                    self._cache[base] = (time.monotonic(), datetime.now(), rates)
+                    self._failed_at.pop(base, None)
+                    return rates
+            print(f"API request for {base} returned {response.status_code}, using fallback data")
         except Exception as e:
             print(f"API request failed: {e}, using fallback data")
-        
-        rate = self._get_fallback_rate(from_currency, to_currency)
-        converted_amount = amount * rate
+        self.stats["api_errors"] += 1
+        self._failed_at[base] = time.monotonic()
+        return None
+
+    async def _latest(self, base: str) -> Optional[tuple[datetime, Dict[str, float]]]:
+        """
+        All rates from a base currency, from the cache while fresh, otherwise from one fetch that
+        concurrent callers share. Falls back to expired cached rates, or None if there are none,
+        without retrying the API for failure_ttl_seconds after a failed fetch.
+        """
+        cached = self._cache.get(base)
+        if cached and time.monotonic() - cached[0] < self.ttl_seconds:
+            self.stats["cache_hits"] += 1
+            return cached[1], cached[2]
+        if time.monotonic() - self._failed_at.get(base, float("-inf")) < self.failure_ttl_seconds:
+            # The API just failed, so don't make every call wait out another timeout
+            self.stats["failures_cached"] += 1
+            if cached:
+                self.stats["stale"] += 1
+                return cached[1], cached[2]
+            return None
+        self._get_client()
+        inflight = self._inflight.get(base)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._request(base))
+            self._inflight[base] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(base, None))
+        else:
+            self.stats["coalesced"] += 1
+        # Shielded so one caller giving up does not cancel the fetch the others are waiting on
+        rates = await asyncio.shield(inflight)
+        if rates is not None:
+            return self._cache[base][1], rates
+        if cached:
+            self.stats["stale"] += 1
+            return cached[1], cached[2]
+        return None
+
+    def _cross_rates(self, base_rates: Dict[str, float]) -> np.ndarray:
+        """
+        Matrix of rates between every pair of supported currencies, where entry [i, j] converts
+        one unit of currency i into currency j, triangulated through the base currency.
+        """
+        quotes = np.array([1.0 if currency == MATRIX_BASE else base_rates[currency] for currency in self.supported_currencies])
+        return np.outer(1.0 / quotes, quotes)
+
+    async def get_matrix(self) -> tuple[np.ndarray, datetime, str]:
+        """The current cross-rate matrix, rebuilt only when fresh base rates arrive."""
+        latest = await self._latest(MATRIX_BASE)
+        if latest is not None and all(currency in latest[1] for currency in self.supported_currencies):
+            fetched_at, rates = latest
+            current = self._matrix
+            if current is None or current[3] is not rates:
+                current = (self._cross_rates(rates), fetched_at, 'api', rates)
+                self._matrix = current
+            return current[0], current[1], current[2]
+        self.stats["fallbacks"] += 1
+        return self._fallback_matrix, datetime.now(), 'fallback'
+
+    def _check_supported(self, *currencies: str) -> None:
+        for currency in currencies:
+            if currency not in self.supported_currencies:
+                raise ValueError(f"Currency {currency} is not supported")
+
+    async def _rates(self, from_currency: str, to_currencies: List[str]) -> tuple[Dict[str, float], str, datetime]:
+        """Rates from one currency to several, read off the cross-rate matrix (live or fallback)."""
+        matrix, fetched_at, source = await self.get_matrix()
+        row = matrix[self._index[from_currency]]
+        return {currency: float(row[self._index[currency]]) for currency in to_currencies}, source, fetched_at
+
+    async def convert_many(self, amounts: List[float], from_currencies: List[str], to_currencies: List[str]) -> Dict:
+        """
+        Convert many amounts in one vectorized step. Currency lists may also be a single currency
+        that applies to every amount, e.g. a whole portfolio into USD.
+        """
+        from_currencies = [currency.upper() for currency in from_currencies]
+        to_currencies = [currency.upper() for currency in to_currencies]
+        self._check_supported(*from_currencies, *to_currencies)
+        for currencies in (from_currencies, to_currencies):
+            if len(currencies) not in (1, len(amounts)):
+                raise ValueError("Give one currency, or one per amount")
+        matrix, fetched_at, source = await self.get_matrix()
+        rows = np.array([self._index[currency] for currency in from_currencies])
+        columns = np.array([self._index[currency] for currency in to_currencies])
+        rates = np.broadcast_to(matrix[rows, columns], (len(amounts),))
+        converted = np.asarray(amounts, dtype=float) * rates
+        return {
+            'converted_amounts': converted.tolist(),
+            'rates': rates.tolist(),
+            'total': float(converted.sum()) if len(set(to_currencies)) == 1 else None,
+            'timestamp': fetched_at.isoformat(),
+            'source': source
+        }
+
+    async def get_cross_rates(self, currencies: Optional[List[str]] = None) -> Dict:
+        currencies = [currency.upper() for currency in currencies] if currencies else self.list_supported_currencies()
+        self._check_supported(*currencies)
+        matrix, fetched_at, source = await self.get_matrix()
+        index = np.array([self._index[currency] for currency in currencies])
+        sub = matrix[np.ix_(index, index)]
+        return {
+            'rates': {currency: dict(zip(currencies, row)) for currency, row in zip(currencies, sub.tolist())},
+            'timestamp': fetched_at.isoformat(),
+            'source': source
+        }
+
+    async def get_exchange_rate(self, from_currency: str, to_currency: str, amount: float = 1.0) -> Dict:
+        from_currency = from_currency.upper()
+        to_currency = to_currency.upper()
+        self._check_supported(from_currency, to_currency)
+
+        rates, source, fetched_at = await self._rates(from_currency, [to_currency])
+        rate = rates[to_currency]
         return {
             'from_currency': from_currency,
             'to_currency': to_currency,
             'rate': rate,
             'amount': amount,
-            'converted_amount': converted_amount,
-            'timestamp': datetime.now().isoformat(),
-            'source': 'fallback'
+            'converted_amount': amount * rate,
+            'timestamp': fetched_at.isoformat(),
+            'source': source
         }
-    
-    def convert_currency(self, amount: float, from_currency: str, to_currency: str) -> Dict:
-        return self.get_exchange_rate(from_currency, to_currency, amount)
-    
+
+    async def convert_currency(self, amount: float, from_currency: str, to_currency: str) -> Dict:
+        return await self.get_exchange_rate(from_currency, to_currency, amount)
+
     def list_supported_currencies(self) -> List[str]:
         return self.supported_currencies.copy()
-    
-    def get_multiple_rates(self, from_currency: str, to_currencies: List[str]) -> Dict:
+
+    async def get_multiple_rates(self, from_currency: str, to_currencies: List[str]) -> Dict:
         from_currency = from_currency.upper()
-        rates = {}
-        
-        for to_currency in to_currencies:
-            try:
-                result = self.get_exchange_rate(from_currency, to_currency)
-                rates[to_currency] = result['rate']
-            except Exception as e:
-                rates[to_currency] = f"Error: {str(e)}"
-        
+        to_currencies = [currency.upper() for currency in to_currencies]
+        self._check_supported(from_currency)
+        supported = [currency for currency in to_currencies if currency in self.supported_currencies]
+        rates: Dict[str, object] = {currency: f"Error: Currency {currency} is not supported" for currency in to_currencies}
+        source, fetched_at = 'api', datetime.now()
+        if supported:
+            found, source, fetched_at = await self._rates(from_currency, supported)
+            rates.update(found)
+
         return {
             'base_currency': from_currency,
             'rates': rates,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': fetched_at.isoformat(),
+            'source': source
         }
 
 currency_service = CurrencyExchangeService()
 
-def get_exchange_rate(from_currency: str, to_currency: str, amount: float = 1.0) -> str:
+async def get_exchange_rate(from_currency: str, to_currency: str, amount: float = 1.0) -> str:
     try:
-        result = currency_service.get_exchange_rate(from_currency, to_currency, amount)
+        result = await currency_service.get_exchange_rate(from_currency, to_currency, amount)
         return json.dumps(result, indent=2)
     except Exception as e:
         return json.dumps({'error': str(e)}, indent=2)
 
-def convert_currency(amount: float, from_currency: str, to_currency: str) -> str:
+async def convert_currency(amount: float, from_currency: str, to_currency: str) -> str:
     try:
-        result = currency_service.convert_currency(amount, from_currency, to_currency)
+        result = await currency_service.convert_currency(amount, from_currency, to_currency)
         return json.dumps(result, indent=2)
     except Exception as e:
         return json.dumps({'error': str(e)}, indent=2)
@@ -123,15 +247,37 @@ def list_supported_currencies() -> str:
     except Exception as e:
         return json.dumps({'error': str(e)}, indent=2)
 
-def get_multiple_rates(from_currency: str, to_currencies: str) -> str:
+async def get_multiple_rates(from_currency: str, to_currencies: str) -> str:
     try:
         to_list = [c.strip().upper() for c in to_currencies.split(',')]
-        result = currency_service.get_multiple_rates(from_currency, to_list)
+        result = await currency_service.get_multiple_rates(from_currency, to_list)
         return json.dumps(result, indent=2)
     except Exception as e:
         return json.dumps({'error': str(e)}, indent=2)
 
+async def convert_many(amounts: List[float], from_currencies: List[str], to_currencies: List[str]) -> str:
+    try:
+        result = await currency_service.convert_many(amounts, from_currencies, to_currencies)
+        return json.dumps(result, indent=2)
+    except Exception as e:
+        return json.dumps({'error': str(e)}, indent=2)
+
+async def get_cross_rates(currencies: str = "") -> str:
+    try:
+        to_list = [c.strip().upper() for c in currencies.split(',') if c.strip()]
+        result = await currency_service.get_cross_rates(to_list)
+        return json.dumps(result, indent=2)
+    except Exception as e:
+        return json.dumps({'error': str(e)}, indent=2)
+
+def get_rate_stats() -> str:
+    return json.dumps(currency_service.stats, indent=2)
+
+async def main():
+    print(await get_exchange_rate("USD", "EUR", 100))
+    print(await convert_currency(50, "EUR", "JPY"))
+    print(list_supported_currencies())
+    print(get_rate_stats())
+
 if __name__ == "__main__":
-    print(get_exchange_rate("USD", "EUR", 100))
-    print(convert_currency(50, "EUR", "JPY"))
-    print(list_supported_currencies())
\ No newline at end of file
+    asyncio.run(main())
@@ -1,5 +1,5 @@
 from mcp.server.fastmcp import FastMCP
-from currency_rates import get_exchange_rate, convert_currency, list_supported_currencies, get_multiple_rates
+from currency_rates import get_exchange_rate, convert_currency, list_supported_currencies, get_multiple_rates, get_rate_stats, convert_many, get_cross_rates
 
 mcp = FastMCP("currency_server")
 
@@ -12,7 +12,7 @@ async def get_currency_rate(from_currency: str, to_currency: str, amount: float
         to_currency: The target currency code (e.g., EUR, JPY) 
         amount: The amount to convert (defaults to 1.0)
     """
-    return get_exchange_rate(from_currency, to_currency, amount)
+    return await get_exchange_rate(from_currency, to_currency, amount)
 
 @mcp.tool()
 async def convert_money(amount: float, from_currency: str, to_currency: str) -> str:
@@ -23,7 +23,7 @@ async def convert_money(amount: float, from_currency: str, to_currency: str) ->
         from_currency: The source currency code (e.g., USD, EUR)
         to_currency: The target currency code (e.g., EUR, JPY)
     """
-    return convert_currency(amount, from_currency, to_currency)
+    return await convert_currency(amount, from_currency, to_currency)
 
 @mcp.tool()
 async def get_supported_currencies() -> str:
@@ -41,17 +41,42 @@ async def get_currency_rates(from_currency: str, to_currencies: str) -> str:
         from_currency: The base currency code (e.g., USD)
         to_currencies: Comma-separated list of target currencies (e.g., "EUR,GBP,JPY")
     """
-    return get_multiple_rates(from_currency, to_currencies)
+    return await get_multiple_rates(from_currency, to_currencies)
+
+@mcp.tool()
+async def convert_amounts(amounts: list[float], from_currencies: list[str], to_currencies: list[str]) -> str:
+    """Convert many amounts between currencies in one call, e.g. a whole multi-currency portfolio.
+
+    Args:
+        amounts: The amounts to convert
+        from_currencies: The currency of each amount, or a single currency for all of them
+        to_currencies: The target currency for each amount, or a single currency for all of them (the result then includes a total)
+    """
+    return await convert_many(amounts, from_currencies, to_currencies)
+
+@mcp.tool()
+async def get_cross_rate_table(currencies: str = "") -> str:
+    """Get the table of exchange rates between every pair of currencies.
+
+    Args:
+        currencies: Comma-separated currencies to include (e.g. "USD,EUR,JPY"), or empty for all supported currencies
+    """
+    return await get_cross_rates(currencies)
 
 @mcp.resource("currency://rates/{from_currency}/{to_currency}")
 async def read_exchange_rate_resource(from_currency: str, to_currency: str) -> str:
     """Resource to get exchange rate information between two currencies."""
-    return get_exchange_rate(from_currency, to_currency, 1.0)
+    return await get_exchange_rate(from_currency, to_currency, 1.0)
 
 @mcp.resource("currency://supported")
 async def read_supported_currencies_resource() -> str:
     """Resource to get the list of supported currencies."""
     return list_supported_currencies()
 
+@mcp.resource("currency://stats")
+async def read_rate_stats_resource() -> str:
+    """Resource with counters for rate fetches, cache hits, coalesced requests and fallbacks."""
+    return get_rate_stats()
+
 if __name__ == "__main__":
     mcp.run(transport='stdio')
\ No newline at end of file
@@ -1,46 +1,842 @@
 import sqlite3
 import json
-from datetime import datetime
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+import clock
 
 load_dotenv(override=True)
 
 DB = "accounts.db"
 
+# Connection tuning; WAL lets the dashboard's readers run alongside the MCP servers' writers
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
 
-with sqlite3.connect(DB) as conn:
+# Portfolio value retention: raw points, then minute, hourly and daily OHLC rollups (0 keeps forever)
+RAW_RETENTION_HOURS = float(os.getenv("PORTFOLIO_RAW_RETENTION_HOURS", "24"))
+MINUTE_RETENTION_DAYS = float(os.getenv("PORTFOLIO_MINUTE_RETENTION_DAYS", "7"))
+HOUR_RETENTION_DAYS = float(os.getenv("PORTFOLIO_HOUR_RETENTION_DAYS", "90"))
+DAY_RETENTION_DAYS = float(os.getenv("PORTFOLIO_DAY_RETENTION_DAYS", "0"))
+COMPACT_EVERY_SECONDS = float(os.getenv("PORTFOLIO_COMPACT_EVERY_SECONDS", "300"))
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Currency of account_state.balance, trade prices and portfolio values; cash in any other
+# currency is kept in cash_balances
+LEDGER_CURRENCY = "USD"
+# Resolution name -> (seconds per bucket, length of the timestamp prefix that identifies the bucket)
+RESOLUTIONS = {"raw": (0, 19), "minute": (60, 16), "hour": (3600, 13), "day": (86400, 10)}
+
+_local = threading.local()
+_last_compaction: dict[str, float] = {}
+
+
+def _open(path: str, readonly: bool) -> sqlite3.Connection:
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None)
+    else:
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={SYNCHRONOUS}')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+def get_connection(readonly: bool = False) -> sqlite3.Connection:
+    """
+    Return a connection to the database that is reused for the lifetime of this thread.
+
+    Connections are cached per thread and per process (a forked child opens its own),
+    run in autocommit mode and have WAL and busy_timeout configured.
+
+    Args:
+        readonly (bool): Open the database read-only, for readers such as the dashboard
+
+    Returns:
+        sqlite3.Connection: The cached connection
+    """
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        _local.pid = pid
+        _local.connections = {}
+    key = (DB, readonly)
+    conn = _local.connections.get(key)
+    if conn is None:
+        conn = _open(DB, readonly)
+        _local.connections[key] = conn
+    return conn
+
+
+@contextmanager
+def snapshot():
+    """
+    Run the enclosed reads against one consistent snapshot on the read-only connection.
+
+    Yields:
+        sqlite3.Cursor: A cursor on the read-only connection
+    """
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
-    cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
+    cursor.execute('BEGIN')
+    try:
+        yield cursor
+    finally:
+        conn.rollback()
+
+
+@contextmanager
+def transaction():
+    """
+    Run the enclosed statements in a single write transaction on the thread's connection.
+
+    Yields:
+        sqlite3.Cursor: A cursor on the write connection
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        yield cursor
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def close_connections() -> None:
+    """Close every connection cached by the current thread."""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+
+def replay_cost_basis(holdings: dict[str, int], transactions: list[dict]) -> tuple[dict[str, float], float]:
+    """
+    Average cost of each holding and the realized P&L, worked out from a transaction ledger.
+    Holdings the ledger does not explain (e.g. an account edited by hand) get no cost basis.
+
+    Returns:
+        tuple: The cost basis per held symbol and the total realized P&L
+    """
+    positions: dict[str, list[float]] = {}
+    realized_pnl = 0.0
+    for t in transactions:
+        quantity, cost = positions.setdefault(t["symbol"], [0, 0.0])
+        if t["quantity"] > 0:
+            positions[t["symbol"]] = [quantity + t["quantity"], cost + t["quantity"] * t["price"]]
+        elif quantity > 0:
+            sold = min(-t["quantity"], quantity)
+            cost_sold = cost * sold / quantity
+            realized_pnl += sold * t["price"] - cost_sold
+            positions[t["symbol"]] = [quantity - sold, cost - cost_sold]
+    cost_basis = {}
+    for symbol, held in holdings.items():
+        quantity, cost = positions.get(symbol, (0, 0.0))
+        cost_basis[symbol] = cost / quantity * min(held, quantity) if quantity > 0 else 0.0
+    return cost_basis, realized_pnl
+
+
+def _insert_account(cursor: sqlite3.Cursor, name: str, account_dict: dict) -> None:
+    if "cost_basis" in account_dict:
+        cost_basis, realized_pnl = account_dict["cost_basis"], account_dict.get("realized_pnl", 0.0)
+    else:
+        cost_basis, realized_pnl = replay_cost_basis(account_dict["holdings"], account_dict["transactions"])
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            datetime DATETIME,
-            type TEXT,
-            message TEXT
+        INSERT INTO account_state (name, balance, strategy, realized_pnl)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET
+            balance=excluded.balance, strategy=excluded.strategy, realized_pnl=excluded.realized_pnl
+    ''', (name, account_dict["balance"], account_dict["strategy"], realized_pnl))
+    cursor.executemany(
+        'INSERT INTO holdings (name, symbol, quantity, cost_basis) VALUES (?, ?, ?, ?)',
+        [
+            (name, symbol, quantity, cost_basis.get(symbol, 0.0))
+            for symbol, quantity in account_dict["holdings"].items()
+            if quantity
+        ],
+    )
+    cursor.executemany('''
+        INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        (name, t["symbol"], t["quantity"], t["price"], t["timestamp"], t["rationale"])
+        for t in account_dict["transactions"]
+    ])
+    cursor.executemany(
+        'INSERT INTO portfolio_values (name, datetime, value) VALUES (?, ?, ?)',
+        [(name, when, value) for when, value in account_dict["portfolio_value_time_series"]],
+    )
+    cursor.executemany(
+        'INSERT INTO cash_balances (name, currency, amount) VALUES (?, ?, ?)',
+        [(name, currency, amount) for currency, amount in account_dict.get("cash", {}).items() if amount],
+    )
+
+
+def init_db() -> None:
+    with transaction() as cursor:
+        # Accounts are a small state row plus append-only ledgers, so a trade is an insert and an update
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS account_state (
+                name TEXT PRIMARY KEY,
+                balance REAL NOT NULL,
+                strategy TEXT NOT NULL DEFAULT '',
+                realized_pnl REAL NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS holdings (
+                name TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                cost_basis REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (name, symbol)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                price REAL NOT NULL,
+                timestamp TEXT NOT NULL,
+                rationale TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_name_id ON transactions (name, id)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cash_balances (
+                name TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                amount REAL NOT NULL,
+                PRIMARY KEY (name, currency)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS portfolio_values (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                datetime TEXT NOT NULL,
+                value REAL NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_values_name_datetime ON portfolio_values (name, datetime)')
+        # Older portfolio values are rolled up into OHLC buckets: resolution is minute, hour or day
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS portfolio_rollups (
+                name TEXT NOT NULL,
+                resolution TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (name, resolution, bucket)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                datetime DATETIME,
+                type TEXT,
+                message TEXT
+            )
+        ''')
+        # The dashboard polls the newest logs per trader (and per type) every second. Rows are
+        # ordered by time rather than id, since the trace sink inserts a batch after the
+        # synchronous account logs written meanwhile; id only breaks ties within a second
+        cursor.execute('DROP INDEX IF EXISTS idx_logs_name_id')
+        cursor.execute('DROP INDEX IF EXISTS idx_logs_name_type_id')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_name_datetime ON logs (name, datetime, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_name_type_datetime ON logs (name, type, datetime, id)')
+        # One row per ticker per trading date, so a lookup never deserializes the whole universe
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS market_prices (
+                date TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                close REAL NOT NULL,
+                PRIMARY KEY (date, ticker)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_market_prices_ticker_date ON market_prices (ticker, date)')
+        # Exchange rate snapshots, as units of each currency per unit of LEDGER_CURRENCY, kept so
+        # past portfolio values can be revalued at the rates of their time
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fx_rates (
+                currency TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                rate REAL NOT NULL,
+                PRIMARY KEY (currency, timestamp)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fx_rates_timestamp ON fx_rates (timestamp)')
+        # Share prices cached across every MCP server process, plus leases so only one process fetches a symbol
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS price_cache (
+                symbol TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                price REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (symbol, plan)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS price_leases (
+                symbol TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (symbol, plan)
+            )
+        ''')
+        _migrate_cost_basis(cursor)
+        _migrate_account_blobs(cursor)
+        _migrate_market_blobs(cursor)
+
+
+def _migrate_account_blobs(cursor: sqlite3.Cursor) -> None:
+    """Move accounts stored as one JSON blob per row into the normalized tables, once."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'accounts'")
+    if not cursor.fetchone():
+        return
+    for name, account in cursor.execute('SELECT name, account FROM accounts').fetchall():
+        cursor.execute('SELECT 1 FROM account_state WHERE name = ?', (name,))
+        if not cursor.fetchone():
+            _insert_account(cursor, name, json.loads(account))
+    cursor.execute('ALTER TABLE accounts RENAME TO accounts_json_backup')
+
+
+def _migrate_cost_basis(cursor: sqlite3.Cursor) -> None:
+    """Add cost basis and realized P&L columns to older databases, filled in from each ledger, once."""
+    cursor.execute("SELECT 1 FROM pragma_table_info('holdings') WHERE name = 'cost_basis'")
+    if cursor.fetchone():
+        return
+    cursor.execute('ALTER TABLE holdings ADD COLUMN cost_basis REAL NOT NULL DEFAULT 0')
+    cursor.execute('ALTER TABLE account_state ADD COLUMN realized_pnl REAL NOT NULL DEFAULT 0')
+    for (name,) in cursor.execute('SELECT name FROM account_state').fetchall():
+        cursor.execute('SELECT symbol, quantity FROM holdings WHERE name = ?', (name,))
+        holdings = dict(cursor.fetchall())
+        cursor.execute('SELECT symbol, quantity, price FROM transactions WHERE name = ? ORDER BY id', (name,))
+        transactions = [{"symbol": symbol, "quantity": quantity, "price": price} for symbol, quantity, price in cursor.fetchall()]
+        cost_basis, realized_pnl = replay_cost_basis(holdings, transactions)
+        cursor.executemany(
+            'UPDATE holdings SET cost_basis = ? WHERE name = ? AND symbol = ?',
+            [(cost, name, symbol) for symbol, cost in cost_basis.items()],
         )
-    ''')
-    cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
-    conn.commit()
+        cursor.execute('UPDATE account_state SET realized_pnl = ? WHERE name = ?', (realized_pnl, name))
+
+
+def _migrate_market_blobs(cursor: sqlite3.Cursor) -> None:
+    """Split market snapshots stored as one JSON blob per date into per-ticker rows, once."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'market'")
+    if not cursor.fetchone():
+        return
+    for date, data in cursor.execute('SELECT date, data FROM market').fetchall():
+        cursor.executemany(
+            'INSERT OR IGNORE INTO market_prices (date, ticker, close) VALUES (?, ?, ?)',
+            [(date, ticker, close) for ticker, close in json.loads(data).items() if close is not None],
+        )
+    cursor.execute('ALTER TABLE market RENAME TO market_json_backup')
+
+
+def use_database(path: str) -> None:
+    """
+    Point this process at a different database file, creating the schema if needed.
+
+    Args:
+        path (str): Path of the SQLite database file
+    """
+    global DB
+    close_connections()
+    DB = path
+    init_db()
+
+
+init_db()
 
 def write_account(name, account_dict):
-    json_data = json.dumps(account_dict)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO accounts (name, account)
-            VALUES (?, ?)
-            ON CONFLICT(name) DO UPDATE SET account=excluded.account
-        ''', (name.lower(), json_data))
-        conn.commit()
+    """
+    Replace everything stored for an account: its state row, holdings and full history.
+    Used when an account is created or reset; trades use write_trade instead.
+    """
+    name = name.lower()
+    with transaction() as cursor:
+        for table in ('holdings', 'cash_balances', 'transactions', 'portfolio_values', 'portfolio_rollups'):
+            cursor.execute(f'DELETE FROM {table} WHERE name = ?', (name,))
+        _insert_account(cursor, name, account_dict)
 
-def read_account(name):
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT account FROM accounts WHERE name = ?', (name.lower(),))
+def update_account(name: str, balance: float | None = None, strategy: str | None = None):
+    """
+    Update the balance and/or strategy in an account's state row.
+    
+    Args:
+        name (str): The account name
+        balance (float): The new cash balance, or None to leave it unchanged
+        strategy (str): The new strategy, or None to leave it unchanged
+    """
+    with transaction() as cursor:
+        cursor.execute('''
+            UPDATE account_state
+            SET balance = COALESCE(?, balance), strategy = COALESCE(?, strategy)
+            WHERE name = ?
+        ''', (balance, strategy, name.lower()))
+
+def _apply_trade(cursor: sqlite3.Cursor, name: str, t: dict) -> dict:
+    """
+    Apply one trade inside an open write transaction, as conditional updates relative to the
+    stored balance and holding, so concurrent trades can never overwrite each other. The
+    holding's cost basis and the account's realized P&L are kept at average cost.
+
+    Returns:
+        dict: The balance and realized_pnl afterwards, and the symbol's quantity and cost_basis
+
+    Raises:
+        ValueError: If the account lacks the cash for a buy or the shares for a sale
+    """
+    symbol, quantity = t["symbol"], t["quantity"]
+    cost = quantity * t["price"]
+    if quantity > 0:
+        cursor.execute(
+            'UPDATE account_state SET balance = balance - ? WHERE name = ? AND balance >= ?',
+            (cost, name, cost),
+        )
+        if cursor.rowcount == 0:
+            raise ValueError("Insufficient funds to buy shares.")
+        cursor.execute('''
+            INSERT INTO holdings (name, symbol, quantity, cost_basis)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(name, symbol) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                cost_basis = cost_basis + excluded.cost_basis
+        ''', (name, symbol, quantity, cost))
+    else:
+        # The write lock is already held, so the holding cannot change between this read and the update
+        cursor.execute('SELECT quantity, cost_basis FROM holdings WHERE name = ? AND symbol = ?', (name, symbol))
         row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
+        if not row or row[0] < -quantity:
+            raise ValueError(f"Cannot sell {-quantity} shares of {symbol}. Not enough shares held.")
+        cost_sold = row[1] * -quantity / row[0]
+        cursor.execute(
+            'UPDATE holdings SET quantity = quantity + ?, cost_basis = cost_basis - ? WHERE name = ? AND symbol = ?',
+            (quantity, cost_sold, name, symbol),
+        )
+        cursor.execute(
+            'UPDATE account_state SET balance = balance - ?, realized_pnl = realized_pnl + ? WHERE name = ?',
+            (cost, -cost - cost_sold, name),
+        )
+    cursor.execute('''
+        INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (name, symbol, quantity, t["price"], t["timestamp"], t["rationale"]))
+    cursor.execute('SELECT quantity, cost_basis FROM holdings WHERE name = ? AND symbol = ?', (name, symbol))
+    held, cost_basis = cursor.fetchone()
+    if held == 0:
+        cursor.execute('DELETE FROM holdings WHERE name = ? AND symbol = ?', (name, symbol))
+        cost_basis = 0.0
+    cursor.execute('SELECT balance, realized_pnl FROM account_state WHERE name = ?', (name,))
+    balance, realized_pnl = cursor.fetchone()
+    return {"balance": balance, "realized_pnl": realized_pnl, "symbol": symbol, "quantity": held, "cost_basis": cost_basis}
+
+def write_trade(name: str, transaction_dict: dict) -> dict:
+    """
+    Record a trade atomically: check and update the balance and the one holding it touches and
+    append the transaction, all in one transaction against the stored state.
+    
+    Args:
+        name (str): The account name
+        transaction_dict (dict): The transaction (symbol, quantity, price, timestamp, rationale);
+            a positive quantity buys and a negative one sells
+        
+    Returns:
+        dict: The balance and realized_pnl afterwards, and the symbol's quantity and cost_basis
+        
+    Raises:
+        ValueError: If the account lacks the cash for a buy or the shares for a sale
+    """
+    with transaction() as cursor:
+        return _apply_trade(cursor, name.lower(), transaction_dict)
+
+def write_trades(name: str, transaction_dicts: list[dict]) -> list[dict]:
+    """
+    Record a basket of trades atomically, in order: either every trade is applied or none is.
+
+    Args:
+        name (str): The account name
+        transaction_dicts (list): The transactions, applied in the order given
+
+    Returns:
+        list: What write_trade returns, for each trade in turn
+
+    Raises:
+        ValueError: If any trade lacks the cash or shares it needs; nothing is recorded
+    """
+    name = name.lower()
+    with transaction() as cursor:
+        return [_apply_trade(cursor, name, t) for t in transaction_dicts]
+
+def _read_cash(cursor: sqlite3.Cursor, name: str) -> dict[str, float]:
+    cursor.execute('SELECT currency, amount FROM cash_balances WHERE name = ? ORDER BY currency', (name,))
+    return dict(cursor.fetchall())
+
+def adjust_cash(name: str, amounts: dict[str, float]) -> tuple[float, dict[str, float]]:
+    """
+    Add to or take from an account's cash in several currencies at once, e.g. both legs of a
+    currency exchange, as conditional updates in one transaction.
+
+    Args:
+        name (str): The account name
+        amounts (dict): Mapping of currency to the amount to add, negative to take away
+
+    Returns:
+        tuple: The LEDGER_CURRENCY balance and the other currencies' cash afterwards
+
+    Raises:
+        ValueError: If any currency would go below zero; nothing is changed
+    """
+    name = name.lower()
+    with transaction() as cursor:
+        for currency, amount in amounts.items():
+            if currency == LEDGER_CURRENCY:
+                cursor.execute(
+                    'UPDATE account_state SET balance = balance + ? WHERE name = ? AND balance + ? >= 0',
+                    (amount, name, amount),
+                )
+            elif amount >= 0:
+                cursor.execute('''
+                    INSERT INTO cash_balances (name, currency, amount) VALUES (?, ?, ?)
+                    ON CONFLICT(name, currency) DO UPDATE SET amount = amount + excluded.amount
+                ''', (name, currency, amount))
+            else:
+                cursor.execute(
+                    'UPDATE cash_balances SET amount = amount + ? WHERE name = ? AND currency = ? AND amount + ? >= 0',
+                    (amount, name, currency, amount),
+                )
+            if cursor.rowcount == 0:
+                raise ValueError(f"Insufficient {currency} funds.")
+        cursor.execute('DELETE FROM cash_balances WHERE name = ? AND amount < 1e-9', (name,))
+        cursor.execute('SELECT balance FROM account_state WHERE name = ?', (name,))
+        return cursor.fetchone()[0], _read_cash(cursor, name)
+
+def write_fx_rates(timestamp: str, rates: dict[str, float]) -> None:
+    """
+    Record an exchange rate snapshot.
+
+    Args:
+        timestamp (str): When the rates applied, as 'YYYY-MM-DD HH:MM:SS'
+        rates (dict): Units of each currency per unit of LEDGER_CURRENCY
+    """
+    with transaction() as cursor:
+        cursor.executemany(
+            'INSERT OR REPLACE INTO fx_rates (currency, timestamp, rate) VALUES (?, ?, ?)',
+            [(currency, timestamp, rate) for currency, rate in rates.items()],
+        )
+
+def read_latest_fx_rates() -> tuple[str, dict[str, float]] | None:
+    """
+    Read the most recent exchange rate snapshot.
+
+    Returns:
+        tuple | None: The snapshot's timestamp and its rates per unit of LEDGER_CURRENCY, or None if there are none
+    """
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute('''
+        SELECT timestamp, currency, rate FROM fx_rates
+        WHERE timestamp = (SELECT MAX(timestamp) FROM fx_rates)
+    ''')
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    return rows[0][0], {currency: rate for _, currency, rate in rows}
+
+def read_fx_history(currency: str, start: str | None = None, end: str | None = None) -> list[tuple[str, float]]:
+    """
+    Read the recorded rates of one currency over a time range, starting from the last snapshot
+    at or before start so the whole range is covered.
+
+    Returns:
+        list: (timestamp, units of currency per unit of LEDGER_CURRENCY) tuples in chronological order
+    """
+    start = start or ""
+    end = end or "9999-12-31 23:59:59"
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute('''
+        SELECT timestamp, rate FROM fx_rates
+        WHERE currency = ? AND timestamp <= ? AND timestamp >= COALESCE(
+            (SELECT MAX(timestamp) FROM fx_rates WHERE currency = ? AND timestamp <= ?), ?
+        )
+        ORDER BY timestamp
+    ''', (currency, end, currency, start, start))
+    return cursor.fetchall()
+
+def write_portfolio_value(name: str, timestamp: str, value: float):
+    """
+    Append a point to an account's portfolio value time series, compacting older
+    points into rollups at most every COMPACT_EVERY_SECONDS per account.
+    
+    Args:
+        name (str): The account name
+        timestamp (str): When the value was measured, as 'YYYY-MM-DD HH:MM:SS'
+        value (float): The total portfolio value
+    """
+    name = name.lower()
+    with transaction() as cursor:
+        cursor.execute(
+            'INSERT INTO portfolio_values (name, datetime, value) VALUES (?, ?, ?)',
+            (name, timestamp, value),
+        )
+    if time.monotonic() - _last_compaction.get(name, float("-inf")) >= COMPACT_EVERY_SECONDS:
+        _last_compaction[name] = time.monotonic()
+        compact_portfolio_values(name)
+
+def _bucket(timestamp: str, resolution: str) -> str:
+    """Floor a 'YYYY-MM-DD HH:MM:SS' timestamp to the start of its bucket."""
+    prefix = RESOLUTIONS[resolution][1]
+    return timestamp[:prefix] + "0000-01-01 00:00:00"[prefix:]
+
+def _merge_ohlc(rows, resolution: str) -> list[tuple]:
+    """Group time-ordered (timestamp, open, high, low, close, count) rows into coarser buckets."""
+    merged = {}
+    for timestamp, open, high, low, close, count in rows:
+        bucket = _bucket(timestamp, resolution)
+        if bucket in merged:
+            _, o, h, l, _, n = merged[bucket]
+            merged[bucket] = (bucket, o, max(h, high), min(l, low), close, n + count)
+        else:
+            merged[bucket] = (bucket, open, high, low, close, count)
+    return list(merged.values())
+
+def _cutoff(now: datetime, **retention) -> str:
+    return (now - timedelta(**retention)).strftime(TIMESTAMP_FORMAT)
+
+def compact_portfolio_values(name: str, now: datetime | None = None):
+    """
+    Roll an account's raw portfolio values into minute, hourly and daily OHLC buckets
+    according to the retention settings, and drop daily buckets past their retention.
+    
+    Args:
+        name (str): The account name
+        now (datetime): The reference time for retention, defaults to clock.now()
+    """
+    name = name.lower()
+    # Backtests stamp points with simulated time, so retention is measured on the same clock
+    now = now or clock.now()
+    upsert = '''
+        INSERT INTO portfolio_rollups (name, resolution, bucket, open, high, low, close, count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(name, resolution, bucket) DO UPDATE SET
+            high = MAX(high, excluded.high),
+            low = MIN(low, excluded.low),
+            close = excluded.close,
+            count = count + excluded.count
+    '''
+    with transaction() as cursor:
+        if RAW_RETENTION_HOURS:
+            cutoff = _cutoff(now, hours=RAW_RETENTION_HOURS)
+            cursor.execute('''
+                SELECT datetime, value, value, value, value, 1 FROM portfolio_values
+                WHERE name = ? AND datetime < ?
+                ORDER BY datetime, id
+            ''', (name, cutoff))
+            rows = _merge_ohlc(cursor.fetchall(), "minute")
+            cursor.executemany(upsert, [(name, "minute", *row) for row in rows])
+            cursor.execute('DELETE FROM portfolio_values WHERE name = ? AND datetime < ?', (name, cutoff))
+        for finer, coarser, retention in (("minute", "hour", MINUTE_RETENTION_DAYS), ("hour", "day", HOUR_RETENTION_DAYS)):
+            if not retention:
+                continue
+            # Only roll whole coarse buckets, so a bucket is never split across two compactions
+            cutoff = _bucket(_cutoff(now, days=retention), coarser)
+            cursor.execute('''
+                SELECT bucket, open, high, low, close, count FROM portfolio_rollups
+                WHERE name = ? AND resolution = ? AND bucket < ?
+                ORDER BY bucket
+            ''', (name, finer, cutoff))
+            rows = _merge_ohlc(cursor.fetchall(), coarser)
+            cursor.executemany(upsert, [(name, coarser, *row) for row in rows])
+            cursor.execute(
+                'DELETE FROM portfolio_rollups WHERE name = ? AND resolution = ? AND bucket < ?',
+                (name, finer, cutoff),
+            )
+        if DAY_RETENTION_DAYS:
+            cursor.execute(
+                "DELETE FROM portfolio_rollups WHERE name = ? AND resolution = 'day' AND bucket < ?",
+                (name, _cutoff(now, days=DAY_RETENTION_DAYS)),
+            )
+
+def pick_resolution(start: str, end: str, max_points: int) -> str:
+    """
+    Return the finest resolution that covers start..end in at most max_points buckets.
+    
+    Args:
+        start (str): The start of the range, as 'YYYY-MM-DD HH:MM:SS'
+        end (str): The end of the range, as 'YYYY-MM-DD HH:MM:SS'
+        max_points (int): The largest number of points the caller wants back
+    """
+    span = (datetime.strptime(end, TIMESTAMP_FORMAT) - datetime.strptime(start, TIMESTAMP_FORMAT)).total_seconds()
+    for resolution in ("minute", "hour"):
+        if span / RESOLUTIONS[resolution][0] <= max_points:
+            return resolution
+    return "day"
+
+def read_portfolio_values(name: str, start: str | None = None, end: str | None = None,
+                          resolution: str = "raw", max_points: int | None = None) -> list[tuple[str, float]]:
+    """
+    Read an account's portfolio value series over a time range across all storage tiers.
+    
+    Recent points come back at full resolution and older ones as the closing value of
+    their rollup bucket. Asking for a coarser resolution downsamples everything to it.
     
+    Args:
+        name (str): The account name
+        start (str): Inclusive start, as 'YYYY-MM-DD HH:MM:SS', or None for the beginning
+        end (str): Inclusive end, as 'YYYY-MM-DD HH:MM:SS', or None for now
+        resolution (str): One of raw, minute, hour, day, or auto to pick one from max_points
+        max_points (int): Used with resolution='auto' to bound the number of points returned
+        
+    Returns:
+        list: A list of (datetime, value) tuples in chronological order
+    """
+    with snapshot() as cursor:
+        return _read_portfolio_values(cursor, name.lower(), start, end, resolution, max_points)
+
+def _read_portfolio_values(cursor: sqlite3.Cursor, name: str, start: str | None, end: str | None,
+                           resolution: str, max_points: int | None) -> list[tuple[str, float]]:
+    start = start or ""
+    end = end or "9999-12-31 23:59:59"
+    if resolution == "auto":
+        cursor.execute('''
+            SELECT MIN(first) FROM (
+                SELECT MIN(bucket) AS first FROM portfolio_rollups WHERE name = ? AND bucket >= ?
+                UNION ALL
+                SELECT MIN(datetime) FROM portfolio_values WHERE name = ? AND datetime >= ?
+            )
+        ''', (name, start, name, start))
+        first = cursor.fetchone()[0]
+        last = min(end, clock.now().strftime(TIMESTAMP_FORMAT))
+        resolution = pick_resolution(first, last, max_points or 500) if first and first < last else "raw"
+    # Each point lives in exactly one tier, so the tiers can simply be concatenated
+    cursor.execute('''
+        SELECT bucket, open, high, low, close, count FROM portfolio_rollups
+        WHERE name = ? AND bucket BETWEEN ? AND ?
+        UNION ALL
+        SELECT datetime, value, value, value, value, 1 FROM portfolio_values
+        WHERE name = ? AND datetime BETWEEN ? AND ?
+        ORDER BY 1
+    ''', (name, start, end, name, start, end))
+    rows = cursor.fetchall()
+    if resolution != "raw":
+        rows = _merge_ohlc(rows, resolution)
+    return [(row[0], row[4]) for row in rows]
+
+def read_account(name):
+    """
+    Read an account in the shape Account expects, assembled from the state row and ledgers.
+    
+    Returns:
+        dict | None: The account fields, or None if there is no such account
+    """
+    name = name.lower()
+    with snapshot() as cursor:
+        cursor.execute('SELECT balance, strategy, realized_pnl FROM account_state WHERE name = ?', (name,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        balance, strategy, realized_pnl = row
+        cursor.execute('SELECT symbol, quantity, cost_basis FROM holdings WHERE name = ? ORDER BY symbol', (name,))
+        rows = cursor.fetchall()
+        holdings = {symbol: quantity for symbol, quantity, _ in rows}
+        cost_basis = {symbol: cost for symbol, _, cost in rows}
+        cursor.execute('''
+            SELECT symbol, quantity, price, timestamp, rationale FROM transactions
+            WHERE name = ?
+            ORDER BY id
+        ''', (name,))
+        transactions = [
+            {"symbol": symbol, "quantity": quantity, "price": price, "timestamp": timestamp, "rationale": rationale}
+            for symbol, quantity, price, timestamp, rationale in cursor.fetchall()
+        ]
+        series = _read_portfolio_values(cursor, name, None, None, "raw", None)
+        cash = _read_cash(cursor, name)
+    return {
+        "name": name,
+        "balance": balance,
+        "cash": cash,
+        "strategy": strategy,
+        "holdings": holdings,
+        "cost_basis": cost_basis,
+        "realized_pnl": realized_pnl,
+        "transactions": transactions,
+        "portfolio_value_time_series": series,
+    }
+
+def read_account_fields(name: str, fields: list[str], last_transactions: int | None = None) -> dict | None:
+    """
+    Read only the requested parts of an account, without assembling the whole ledger.
+
+    Args:
+        name (str): The account name
+        fields (list): Any of balance, cash, strategy, holdings, cost_basis, realized_pnl, transactions, portfolio_value
+        last_transactions (int): How many of the most recent transactions to return, or None for all
+
+    Returns:
+        dict | None: The requested fields, or None if there is no such account
+    """
+    name = name.lower()
+    with snapshot() as cursor:
+        cursor.execute('SELECT balance, strategy, realized_pnl FROM account_state WHERE name = ?', (name,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        data = {"name": name}
+        if "balance" in fields:
+            data["balance"] = row[0]
+        if "cash" in fields:
+            data["cash"] = _read_cash(cursor, name)
+        if "strategy" in fields:
+            data["strategy"] = row[1]
+        if "realized_pnl" in fields:
+            data["realized_pnl"] = row[2]
+        if "holdings" in fields or "cost_basis" in fields:
+            cursor.execute('SELECT symbol, quantity, cost_basis FROM holdings WHERE name = ? ORDER BY symbol', (name,))
+            rows = cursor.fetchall()
+            if "holdings" in fields:
+                data["holdings"] = {symbol: quantity for symbol, quantity, _ in rows}
+            if "cost_basis" in fields:
+                data["cost_basis"] = {symbol: cost for symbol, _, cost in rows}
+        if "transactions" in fields:
+            cursor.execute('''
+                SELECT symbol, quantity, price, timestamp, rationale FROM transactions
+                WHERE name = ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (name, -1 if last_transactions is None else last_transactions))
+            data["transactions"] = [
+                {"symbol": symbol, "quantity": quantity, "price": price, "timestamp": timestamp, "rationale": rationale}
+                for symbol, quantity, price, timestamp, rationale in reversed(cursor.fetchall())
+            ]
+        if "portfolio_value" in fields:
+            # The most recent recorded valuation, whether it is still raw or already rolled up
+            cursor.execute('''
+                SELECT * FROM (
+                    SELECT datetime, value FROM portfolio_values WHERE name = ? ORDER BY datetime DESC LIMIT 1
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT bucket, close FROM portfolio_rollups WHERE name = ? ORDER BY bucket DESC LIMIT 1
+                )
+                ORDER BY 1 DESC
+                LIMIT 1
+            ''', (name, name))
+            latest = cursor.fetchone()
+            data["portfolio_value"], data["portfolio_value_at"] = (latest[1], latest[0]) if latest else (None, None)
+    return data
+
 def write_log(name: str, type: str, message: str):
     """
     Write a log entry to the logs table.
@@ -50,15 +846,25 @@ def write_log(name: str, type: str, message: str):
         type (str): The type of log entry
         message (str): The log message
     """
-    now = datetime.now().isoformat()
-    
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
+    with transaction() as cursor:
         cursor.execute('''
             INSERT INTO logs (name, datetime, type, message)
             VALUES (?, datetime('now'), ?, ?)
         ''', (name.lower(), type, message))
-        conn.commit()
+
+def write_logs(entries: list[tuple[str, str, str, str]]):
+    """
+    Write a batch of log entries to the logs table in one transaction.
+    
+    Args:
+        entries (list): Tuples of (name, datetime, type, message), datetime in UTC
+            as 'YYYY-MM-DD HH:MM:SS' to match datetime('now')
+    """
+    with transaction() as cursor:
+        cursor.executemany('''
+            INSERT INTO logs (name, datetime, type, message)
+            VALUES (?, ?, ?, ?)
+        ''', [(name.lower(), when, type, message) for name, when, type, message in entries])
 
 def read_log(name: str, last_n=10):
     """
@@ -71,16 +877,15 @@ def read_log(name: str, last_n=10):
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT datetime, type, message FROM logs 
-            WHERE name = ? 
-            ORDER BY datetime DESC
-            LIMIT ?
-        ''', (name.lower(), last_n))
-        
-        return reversed(cursor.fetchall())
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute('''
+        SELECT datetime, type, message FROM logs 
+        WHERE name = ? 
+        ORDER BY datetime DESC, id DESC
+        LIMIT ?
+    ''', (name.lower(), last_n))
+    
+    return reversed(cursor.fetchall())
 
 def read_log_prioritized(name: str, last_n=10):
     """
@@ -93,37 +898,32 @@ def read_log_prioritized(name: str, last_n=10):
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        
-        # First get recent account logs (trading transactions)
-        cursor.execute('''
-            SELECT datetime, type, message FROM logs 
-            WHERE name = ? AND type = 'account'
-            ORDER BY datetime DESC
+    # Newest account logs first, topped up with the newest other logs, returned in order
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute('''
+        SELECT datetime, type, message FROM (
+            SELECT id, datetime, type, message FROM (
+                SELECT id, datetime, type, message, 0 AS priority FROM (
+                    SELECT id, datetime, type, message FROM logs
+                    WHERE name = ? AND type = 'account'
+                    ORDER BY datetime DESC, id DESC
+                    LIMIT ?
+                )
+                UNION ALL
+                SELECT id, datetime, type, message, 1 AS priority FROM (
+                    SELECT id, datetime, type, message FROM logs
+                    WHERE name = ? AND type != 'account'
+                    ORDER BY datetime DESC, id DESC
+                    LIMIT ?
+                )
+            )
+            ORDER BY priority, datetime DESC, id DESC
             LIMIT ?
-        ''', (name.lower(), last_n))
-        
-        account_logs = cursor.fetchall()
-        remaining_slots = last_n - len(account_logs)
-        
-        if remaining_slots > 0:
-            # Fill remaining slots with other log types
-            cursor.execute('''
-                SELECT datetime, type, message FROM logs 
-                WHERE name = ? AND type != 'account'
-                ORDER BY datetime DESC
-                LIMIT ?
-            ''', (name.lower(), remaining_slots))
-            
-            other_logs = cursor.fetchall()
-            all_logs = account_logs + other_logs
-        else:
-            all_logs = account_logs
-        
-        # Sort by datetime descending and return reversed for chronological order
-        all_logs.sort(key=lambda x: x[0], reverse=True)
-        return reversed(all_logs)
+        )
+        ORDER BY datetime, id
+    ''', (name.lower(), last_n, name.lower(), last_n, last_n))
+    
+    return cursor.fetchall()
 
 def read_mcp_tool_logs(name: str, last_n=10):
     """
@@ -136,31 +936,190 @@ def read_mcp_tool_logs(name: str, last_n=10):
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT datetime, type, message FROM logs 
-            WHERE name = ? AND type = 'mcp_tool'
-            ORDER BY datetime DESC
-            LIMIT ?
-        ''', (name.lower(), last_n))
-        
-        return reversed(cursor.fetchall())
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute('''
+        SELECT datetime, type, message FROM logs 
+        WHERE name = ? AND type = 'mcp_tool'
+        ORDER BY datetime DESC, id DESC
+        LIMIT ?
+    ''', (name.lower(), last_n))
+    
+    return reversed(cursor.fetchall())
 
 def write_market(date: str, data: dict) -> None:
-    data_json = json.dumps(data)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO market (date, data)
-            VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET data=excluded.data
-        ''', (date, data_json))
-        conn.commit()
+    """
+    Store a day's closing prices, one row per ticker.
+    
+    Args:
+        date (str): The date the snapshot is for, as 'YYYY-MM-DD'
+        data (dict): Mapping of ticker to closing price
+    """
+    with transaction() as cursor:
+        cursor.executemany('''
+            INSERT INTO market_prices (date, ticker, close)
+            VALUES (?, ?, ?)
+            ON CONFLICT(date, ticker) DO UPDATE SET close=excluded.close
+        ''', [(date, ticker, close) for ticker, close in data.items() if close is not None])
+
+def has_market(date: str) -> bool:
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute('SELECT 1 FROM market_prices WHERE date = ? LIMIT 1', (date,))
+    return cursor.fetchone() is not None
 
 def read_market(date: str) -> dict | None:
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT data FROM market WHERE date = ?', (date,))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
\ No newline at end of file
+    """
+    Read the whole universe of closing prices stored for a date.
+    
+    Returns:
+        dict | None: Mapping of ticker to closing price, or None if the date isn't stored
+    """
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute('SELECT ticker, close FROM market_prices WHERE date = ?', (date,))
+    return dict(cursor.fetchall()) or None
+
+def read_market_prices(date: str, tickers: list[str]) -> dict[str, float]:
+    """
+    Look up closing prices for a few tickers on a date using the primary key.
+    
+    Args:
+        date (str): The date, as 'YYYY-MM-DD'
+        tickers (list): The tickers to look up
+        
+    Returns:
+        dict: Mapping of ticker to closing price for the tickers that were found
+    """
+    if not tickers:
+        return {}
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute(f'''
+        SELECT ticker, close FROM market_prices
+        WHERE date = ? AND ticker IN ({",".join("?" * len(tickers))})
+    ''', (date, *tickers))
+    return dict(cursor.fetchall())
+
+def read_market_history(ticker: str, start: str | None = None, end: str | None = None) -> list[tuple[str, float]]:
+    """
+    Read a ticker's stored closing prices across dates, for analysis.
+    
+    Args:
+        ticker (str): The ticker
+        start (str): Inclusive start date as 'YYYY-MM-DD', or None for the earliest
+        end (str): Inclusive end date as 'YYYY-MM-DD', or None for the latest
+        
+    Returns:
+        list: A list of (date, close) tuples in date order
+    """
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute('''
+        SELECT date, close FROM market_prices
+        WHERE ticker = ? AND date BETWEEN ? AND ?
+        ORDER BY date
+    ''', (ticker, start or "", end or "9999-12-31"))
+    return cursor.fetchall()
+
+def read_market_dates() -> list[str]:
+    """Return every date that has a stored market snapshot, oldest first."""
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute('SELECT DISTINCT date FROM market_prices ORDER BY date')
+    return [row[0] for row in cursor.fetchall()]
+
+def import_market(source: str, start: str, end: str) -> int:
+    """
+    Copy stored market snapshots for a date range from another database file into this one.
+    
+    Args:
+        source (str): Path of the database to copy from
+        start (str): Inclusive start date, as 'YYYY-MM-DD'
+        end (str): Inclusive end date, as 'YYYY-MM-DD'
+        
+    Returns:
+        int: The number of (date, ticker) rows copied
+    """
+    conn = get_connection()
+    conn.execute('ATTACH DATABASE ? AS source', (source,))
+    try:
+        with transaction() as cursor:
+            cursor.execute('''
+                INSERT OR IGNORE INTO market_prices (date, ticker, close)
+                SELECT date, ticker, close FROM source.market_prices
+                WHERE date BETWEEN ? AND ?
+            ''', (start, end))
+            return cursor.rowcount
+    finally:
+        conn.execute('DETACH DATABASE source')
+
+def read_cached_prices(symbols: list[str], plan: str, now: float) -> dict[str, float]:
+    """
+    Read the unexpired cached prices for some symbols.
+    
+    Args:
+        symbols (list): The symbols to look up
+        plan (str): The market data plan the prices came from
+        now (float): The current epoch time, to filter out expired entries
+        
+    Returns:
+        dict: Mapping of symbol to price for the symbols that were cached
+    """
+    if not symbols:
+        return {}
+    cursor = get_connection(readonly=True).cursor()
+    cursor.execute(f'''
+        SELECT symbol, price FROM price_cache
+        WHERE plan = ? AND expires_at > ? AND symbol IN ({",".join("?" * len(symbols))})
+    ''', (plan, now, *symbols))
+    return dict(cursor.fetchall())
+
+def write_cached_prices(prices: dict[str, float], plan: str, expires_at: float) -> None:
+    """
+    Cache prices until expires_at and release any fetch leases held on them.
+    
+    Args:
+        prices (dict): Mapping of symbol to price
+        plan (str): The market data plan the prices came from
+        expires_at (float): Epoch time after which the prices are stale
+    """
+    with transaction() as cursor:
+        cursor.executemany('''
+            INSERT INTO price_cache (symbol, plan, price, expires_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(symbol, plan) DO UPDATE SET price=excluded.price, expires_at=excluded.expires_at
+        ''', [(symbol, plan, price, expires_at) for symbol, price in prices.items()])
+        cursor.executemany(
+            'DELETE FROM price_leases WHERE symbol = ? AND plan = ?',
+            [(symbol, plan) for symbol in prices],
+        )
+
+def acquire_price_leases(symbols: list[str], plan: str, owner: str, now: float, expires_at: float) -> list[str]:
+    """
+    Try to take the right to fetch each symbol from upstream; a lease that has expired
+    can be taken over.
+    
+    Args:
+        symbols (list): The symbols to lease
+        plan (str): The market data plan
+        owner (str): Identifies the caller, e.g. process and thread id
+        now (float): The current epoch time
+        expires_at (float): Epoch time after which others may take the lease over
+        
+    Returns:
+        list: The symbols this owner now holds leases on
+    """
+    acquired = []
+    with transaction() as cursor:
+        for symbol in symbols:
+            cursor.execute('''
+                INSERT INTO price_leases (symbol, plan, owner, expires_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(symbol, plan) DO UPDATE SET owner=excluded.owner, expires_at=excluded.expires_at
+                WHERE price_leases.expires_at <= ?
+            ''', (symbol, plan, owner, expires_at, now))
+            if cursor.rowcount:
+                acquired.append(symbol)
+    return acquired
+
+def release_price_leases(symbols: list[str], plan: str, owner: str) -> None:
+    with transaction() as cursor:
+        cursor.executemany(
+            'DELETE FROM price_leases WHERE symbol = ? AND plan = ? AND owner = ?',
+            [(symbol, plan, owner) for symbol in symbols],
+        )
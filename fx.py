@@ -0,0 +1,100 @@
+"""
+Exchange rate snapshots for valuing accounts that hold more than one currency.
+
+A snapshot is one rate per supported currency against the ledger currency, read off the
+currency service's cross-rate matrix and recorded in the database, so every MCP server
+process shares it and past portfolio values can be revalued at the rates of their time.
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+
+import clock
+from currency_rates import CURRENCY_CACHE_TTL_SECONDS, CurrencyExchangeService
+from database import LEDGER_CURRENCY, TIMESTAMP_FORMAT, read_fx_history, read_latest_fx_rates, write_fx_rates
+
+load_dotenv(override=True)
+
+# How long a recorded snapshot is used before valuations take a new one
+FX_SNAPSHOT_SECONDS = float(os.getenv("FX_SNAPSHOT_SECONDS", str(CURRENCY_CACHE_TTL_SECONDS)))
+
+_service = CurrencyExchangeService()
+_lock = threading.Lock()
+
+SUPPORTED_CURRENCIES = _service.list_supported_currencies()
+
+
+class FxSnapshot:
+    """Units of each currency per unit of the ledger currency, at one moment."""
+
+    def __init__(self, timestamp: str, rates: dict[str, float]):
+        self.timestamp = timestamp
+        self.rates = {**rates, LEDGER_CURRENCY: 1.0}
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        for currency in (from_currency, to_currency):
+            if currency not in self.rates:
+                raise ValueError(f"Currency {currency} is not supported")
+        return self.rates[to_currency] / self.rates[from_currency]
+
+    def convert(self, amounts: dict[str, float], to_currency: str) -> float:
+        """Total of amounts held in several currencies, with one conversion per currency."""
+        return sum(amount * self.rate(currency, to_currency) for currency, amount in amounts.items())
+
+
+async def _fetch_rates() -> tuple[dict[str, float], str]:
+    try:
+        table = await _service.get_cross_rates()
+    finally:
+        # Each fetch runs on an event loop of its own, so its HTTP client is closed with it
+        await _service.aclose()
+    return table["rates"][LEDGER_CURRENCY], table["source"]
+
+
+def _is_fresh(latest: tuple[str, dict] | None, now: datetime) -> bool:
+    return latest is not None and (now - datetime.strptime(latest[0], TIMESTAMP_FORMAT)).total_seconds() < FX_SNAPSHOT_SECONDS
+
+
+def get_fx_snapshot() -> FxSnapshot:
+    """
+    The latest recorded snapshot, taking and recording a new one once it is older than
+    FX_SNAPSHOT_SECONDS. While the currency API is down, the built-in fallback rates are used
+    for the current call only and never recorded, so the next call tries the API again.
+    Called from synchronous code, such as Account on a worker thread.
+    """
+    now = clock.now()
+    latest = read_latest_fx_rates()
+    if not _is_fresh(latest, now):
+        with _lock:
+            # Another thread may have taken one while this one waited
+            latest = read_latest_fx_rates()
+            if not _is_fresh(latest, now):
+                rates, source = asyncio.run(_fetch_rates())
+                latest = (now.strftime(TIMESTAMP_FORMAT), rates)
+                if source != 'api':
+                    return FxSnapshot(*latest)
+                write_fx_rates(*latest)
+    return FxSnapshot(*latest)
+
+
+def revalue(series: list[tuple[str, float]], currency: str) -> list[tuple[str, float]]:
+    """
+    Convert a ledger-currency portfolio value series into another currency, each point at the
+    last snapshot recorded at or before it. Points older than every snapshot use the earliest.
+    """
+    if currency == LEDGER_CURRENCY or not series:
+        return series
+    history = read_fx_history(currency, series[0][0], series[-1][0])
+    if not history:
+        snapshot = get_fx_snapshot()
+        history = [(snapshot.timestamp, snapshot.rate(LEDGER_CURRENCY, currency))]
+    times = np.array([timestamp for timestamp, _ in history])
+    rates = np.array([rate for _, rate in history])
+    timestamps = [timestamp for timestamp, _ in series]
+    which = np.maximum(np.searchsorted(times, timestamps, side="right") - 1, 0)
+    values = np.array([value for _, value in series]) * rates[which]
+    return list(zip(timestamps, values.tolist()))
@@ -1,30 +1,139 @@
 from polygon import RESTClient
 from dotenv import load_dotenv
+from urllib3.util.retry import Retry
+import asyncio
+import certifi
 import os
-from datetime import datetime
-import random
-from database import write_market, read_market
+import urllib3
+from datetime import datetime, timedelta
+import threading
+import time
+from database import (
+    write_market,
+    read_market,
+    has_market,
+    read_market_prices,
+    read_cached_prices,
+    write_cached_prices,
+    acquire_price_leases,
+    release_price_leases,
+)
 from functools import lru_cache
+import clock
+import market_calendar
+import polygon_replay
+from synthetic_market import get_synthetic_prices
 from datetime import timezone
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv(override=True)
 
 polygon_api_key = os.getenv("POLYGON_API_KEY")
+# Replaying recorded traffic needs no real key
+if polygon_replay.POLYGON_TRANSPORT == "replay":
+    polygon_api_key = polygon_api_key or "replay"
 polygon_plan = os.getenv("POLYGON_PLAN")
 
 is_paid_polygon = polygon_plan == "paid"
 is_realtime_polygon = polygon_plan == "realtime"
 
+# Shared Polygon client: connections per host, timeouts, and retries with exponential backoff on 429/5xx
+POLYGON_POOL_SIZE = int(os.getenv("POLYGON_POOL_SIZE", "10"))
+POLYGON_CONNECT_TIMEOUT = float(os.getenv("POLYGON_CONNECT_TIMEOUT", "5"))
+POLYGON_READ_TIMEOUT = float(os.getenv("POLYGON_READ_TIMEOUT", "10"))
+POLYGON_RETRIES = int(os.getenv("POLYGON_RETRIES", "5"))
+POLYGON_BACKOFF_SECONDS = float(os.getenv("POLYGON_BACKOFF_SECONDS", "0.5"))
 
-def is_market_open() -> bool:
-    client = RESTClient(polygon_api_key)
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_polygon_executor = ThreadPoolExecutor(max_workers=POLYGON_POOL_SIZE, thread_name_prefix="polygon")
+
+# Market status follows the local exchange calendar and is confirmed with Polygon once per
+# open/close transition; if Polygon disagrees (an unscheduled closure), it is rechecked this often
+MARKET_STATUS_RECHECK_SECONDS = float(os.getenv("MARKET_STATUS_RECHECK_SECONDS", "900"))
+
+_market_status = {"open": False, "valid_until": 0.0}
+
+# Parallel per-symbol fetches used when a multi-ticker snapshot misses some symbols
+PRICE_FETCH_WORKERS = int(os.getenv("PRICE_FETCH_WORKERS", "8"))
+
+# Prices are cached in the shared database for every MCP server process. Paid-plan prices
+# are 15 minutes delayed, so that is how long they are reused; EOD prices last until midnight.
+PRICE_CACHE_PLAN = "paid" if is_paid_polygon else "eod"
+PRICE_CACHE_TTL_SECONDS = float(os.getenv("PRICE_CACHE_TTL_SECONDS", "900"))
+# How long one process may hold the right to fetch a symbol before others take over
+PRICE_LEASE_SECONDS = float(os.getenv("PRICE_LEASE_SECONDS", "10"))
+PRICE_LEASE_POLL_SECONDS = 0.05
+
+price_cache_stats = {"hits": 0, "misses": 0, "fetched": 0, "waited": 0}
+_stats_lock = threading.Lock()
+
+
+def get_polygon_client() -> RESTClient:
+    """Return this process's Polygon client, building it on first use so connections are reused."""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                client = RESTClient(
+                    polygon_api_key,
+                    connect_timeout=POLYGON_CONNECT_TIMEOUT,
+                    read_timeout=POLYGON_READ_TIMEOUT,
+                    retries=POLYGON_RETRIES,
+                )
+                # Every request goes to one host, so size that host's pool and honour Retry-After
+                client.client = urllib3.PoolManager(
+                    maxsize=POLYGON_POOL_SIZE,
+                    headers=client.headers,
+                    ca_certs=certifi.where(),
+                    cert_reqs="CERT_REQUIRED",
+                    # polygon's BaseClient does not pass its own timeouts per request, so set them on the pool
+                    timeout=urllib3.Timeout(connect=POLYGON_CONNECT_TIMEOUT, read=POLYGON_READ_TIMEOUT),
+                    retries=Retry(
+                        total=POLYGON_RETRIES,
+                        status_forcelist=[429, 500, 502, 503, 504],
+                        backoff_factor=POLYGON_BACKOFF_SECONDS,
+                        respect_retry_after_header=True,
+                    ),
+                )
+                polygon_replay.install(client)
+                _client, _client_pid = client, os.getpid()
+    return _client
+
+
+async def run_polygon(fn, *args):
+    """Run a blocking market call on the Polygon worker pool, for use from async MCP tools."""
+    return await asyncio.get_running_loop().run_in_executor(_polygon_executor, fn, *args)
+
+
+def is_market_open_polygon() -> bool:
+    client = get_polygon_client()
     market_status = client.get_market_status()
     return market_status.market == "open"
 
 
+def is_market_open() -> bool:
+    """Whether the market is open, answered locally except around open/close transitions."""
+    now = time.time()
+    if now < _market_status["valid_until"]:
+        return _market_status["open"]
+    is_open = market_calendar.is_open()
+    valid_until = market_calendar.next_transition().timestamp()
+    if polygon_api_key:
+        try:
+            if is_market_open_polygon() != is_open:
+                is_open = not is_open
+                valid_until = min(valid_until, now + MARKET_STATUS_RECHECK_SECONDS)
+        except Exception as e:
+            print(f"Was not able to check market status with polygon due to {e}; using the calendar")
+    _market_status.update(open=is_open, valid_until=valid_until)
+    return is_open
+
+
 def get_all_share_prices_polygon_eod() -> dict[str, float]:
     """With much thanks to student Reema R. for fixing the timezone issue with this!"""
-    client = RESTClient(polygon_api_key)
+    client = get_polygon_client()
 
     probe = client.get_previous_close_agg("SPY")[0]
     last_close = datetime.fromtimestamp(probe.timestamp / 1000, tz=timezone.utc).date()
@@ -34,37 +143,156 @@ def get_all_share_prices_polygon_eod() -> dict[str, float]:
 
 
 @lru_cache(maxsize=2)
+def ensure_market_for_prior_date(today) -> str:
+    """Make sure the prior close for today is stored, fetching the grouped daily snapshot once."""
+    if not has_market(today):
+        write_market(today, get_all_share_prices_polygon_eod())
+    return today
+
+
 def get_market_for_prior_date(today):
-    market_data = read_market(today)
-    if not market_data:
-        market_data = get_all_share_prices_polygon_eod()
-        write_market(today, market_data)
-    return market_data
+    return read_market(ensure_market_for_prior_date(today))
 
 
-def get_share_price_polygon_eod(symbol) -> float:
+def get_share_prices_polygon_eod(symbols: list[str]) -> dict[str, float]:
     today = datetime.now().date().strftime("%Y-%m-%d")
-    market_data = get_market_for_prior_date(today)
-    return market_data.get(symbol, 0.0)
+    prices = read_market_prices(ensure_market_for_prior_date(today), symbols)
+    return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+
+
+def get_share_price_polygon_eod(symbol) -> float:
+    return get_share_prices_polygon_eod([symbol])[symbol]
 
 
 def get_share_price_polygon_min(symbol) -> float:
-    client = RESTClient(polygon_api_key)
+    client = get_polygon_client()
     result = client.get_snapshot_ticker("stocks", symbol)
     return result.min.close or result.prev_day.close
 
 
-def get_share_price_polygon(symbol) -> float:
-    if is_paid_polygon:
+def get_share_prices_polygon_min(symbols: list[str]) -> dict[str, float]:
+    """Price a basket with a single multi-ticker snapshot request."""
+    client = get_polygon_client()
+    results = client.get_snapshot_all("stocks", tickers=symbols)
+    return {
+        result.ticker: (result.min and result.min.close) or (result.prev_day and result.prev_day.close) or 0.0
+        for result in results
+    }
+
+
+def _try_share_price_polygon_min(symbol) -> float | None:
+    try:
         return get_share_price_polygon_min(symbol)
-    else:
-        return get_share_price_polygon_eod(symbol)
+    except Exception as e:
+        print(f"Was not able to fetch {symbol} from the polygon API due to {e}")
+        return None
+
+
+def fetch_share_prices_polygon(symbols: list[str]) -> dict[str, float]:
+    """Fetch prices from upstream, omitting any symbol that could not be fetched."""
+    if not is_paid_polygon:
+        return get_share_prices_polygon_eod(symbols)
+    try:
+        prices = get_share_prices_polygon_min(symbols)
+    except Exception as e:
+        print(f"Was not able to fetch a multi-ticker snapshot due to {e}; fetching symbols individually")
+        prices = {}
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(PRICE_FETCH_WORKERS, len(missing))) as executor:
+            fetched = zip(missing, executor.map(_try_share_price_polygon_min, missing))
+            prices.update((symbol, price) for symbol, price in fetched if price is not None)
+    return {symbol: prices[symbol] for symbol in symbols if symbol in prices}
+
+
+def _price_expiry(now: float) -> float:
+    if is_paid_polygon:
+        return now + PRICE_CACHE_TTL_SECONDS
+    tomorrow = datetime.fromtimestamp(now).date() + timedelta(days=1)
+    return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+
+def _count(stat: str, n: int) -> None:
+    with _stats_lock:
+        price_cache_stats[stat] += n
+
+
+def get_share_prices_polygon(symbols: list[str]) -> dict[str, float]:
+    """
+    Price symbols through the shared cache. On a miss, a process leases the symbols it
+    will fetch; others asking for the same symbols wait for its result instead of
+    calling upstream too.
+    """
+    owner = f"{os.getpid()}-{threading.get_ident()}"
+    prices = read_cached_prices(symbols, PRICE_CACHE_PLAN, time.time())
+    _count("hits", len(prices))
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    _count("misses", len(missing))
+    waited = False
+    while missing:
+        now = time.time()
+        leased = acquire_price_leases(missing, PRICE_CACHE_PLAN, owner, now, now + PRICE_LEASE_SECONDS)
+        if leased:
+            try:
+                # Another process may have filled the cache between our read and the lease
+                fetched = read_cached_prices(leased, PRICE_CACHE_PLAN, now)
+                to_fetch = [symbol for symbol in leased if symbol not in fetched]
+                if to_fetch:
+                    from_upstream = fetch_share_prices_polygon(to_fetch)
+                    _count("fetched", len(from_upstream))
+                    write_cached_prices(from_upstream, PRICE_CACHE_PLAN, _price_expiry(time.time()))
+                    fetched.update(from_upstream)
+            finally:
+                release_price_leases(leased, PRICE_CACHE_PLAN, owner)
+            prices.update(fetched)
+            # Symbols upstream could not price are left for the caller's fallback
+            missing = [symbol for symbol in missing if symbol not in leased]
+        if missing:
+            if not waited:
+                waited = True
+                _count("waited", len(missing))
+            time.sleep(PRICE_LEASE_POLL_SECONDS)
+            prices.update(read_cached_prices(missing, PRICE_CACHE_PLAN, time.time()))
+            missing = [symbol for symbol in missing if symbol not in prices]
+    return prices
+
+
+def get_share_price_polygon(symbol) -> float:
+    return get_share_prices_polygon([symbol])[symbol]
 
 
 def get_share_price(symbol) -> float:
+    return get_share_prices([symbol])[symbol]
+
+
+def get_share_prices(symbols) -> dict[str, float]:
+    """Price a whole basket of symbols in one pass, returning {symbol: price}."""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    if clock.is_simulated():
+        # Backtests price from the stored snapshot for the simulated date only
+        prices = read_market_prices(clock.now().date().strftime("%Y-%m-%d"), symbols)
+        return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+    prices = {}
     if polygon_api_key:
         try:
-            return get_share_price_polygon(symbol)
+            prices = get_share_prices_polygon(symbols)
         except Exception as e:
-            print(f"Was not able to use the polygon API due to {e}; using a random number")
-    return float(random.randint(1, 100))
+            print(f"Was not able to use the polygon API due to {e}; using synthetic prices")
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        prices.update(get_synthetic_prices(missing))
+    return {symbol: prices[symbol] for symbol in symbols}
+
+
+async def is_market_open_async() -> bool:
+    return await run_polygon(is_market_open)
+
+
+async def get_share_price_async(symbol) -> float:
+    return await run_polygon(get_share_price, symbol)
+
+
+async def get_share_prices_async(symbols) -> dict[str, float]:
+    return await run_polygon(get_share_prices, symbols)
@@ -0,0 +1,143 @@
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+import os
+
+load_dotenv(override=True)
+
+EXCHANGE_TZ = ZoneInfo("America/New_York")
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+# Unscheduled closures (e.g. national days of mourning) as comma-separated YYYY-MM-DD dates
+EXTRA_HOLIDAYS = {
+    date.fromisoformat(day.strip())
+    for day in os.getenv("MARKET_EXTRA_HOLIDAYS", "").split(",")
+    if day.strip()
+}
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """The nth (1-based) given weekday of a month, or the last one when n is -1."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day: date) -> date:
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=8)
+def holidays(year: int) -> frozenset[date]:
+    """NYSE full-day closures for a year."""
+    days = {
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),  # Independence Day
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),  # Christmas
+    }
+    # New Year's Day on a Saturday is not observed on the Friday before
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        days.add(_observed(new_year))
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(days | {day for day in EXTRA_HOLIDAYS if day.year == year})
+
+
+@lru_cache(maxsize=8)
+def early_closes(year: int) -> frozenset[date]:
+    """NYSE 1pm closes: the eve of Independence Day, the day after Thanksgiving and Christmas Eve."""
+    candidates = {
+        date(year, 7, 3),
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),
+        date(year, 12, 24),
+    }
+    return frozenset(day for day in candidates if is_trading_day(day))
+
+
+def is_trading_day(day: date) -> bool:
+    return day.weekday() < 5 and day not in holidays(day.year)
+
+
+def session(day: date) -> tuple[datetime, datetime] | None:
+    """The (open, close) of a trading day in exchange time, or None if the market is shut all day."""
+    if not is_trading_day(day):
+        return None
+    close = EARLY_CLOSE if day in early_closes(day.year) else REGULAR_CLOSE
+    return (
+        datetime.combine(day, REGULAR_OPEN, tzinfo=EXCHANGE_TZ),
+        datetime.combine(day, close, tzinfo=EXCHANGE_TZ),
+    )
+
+
+def _now(now: datetime | None) -> datetime:
+    return (now or datetime.now(EXCHANGE_TZ)).astimezone(EXCHANGE_TZ)
+
+
+def is_open(now: datetime | None = None) -> bool:
+    """Whether the regular session is in progress according to the calendar."""
+    now = _now(now)
+    hours = session(now.date())
+    return hours is not None and hours[0] <= now < hours[1]
+
+
+def next_open(now: datetime | None = None) -> datetime:
+    """The next regular session open strictly after now."""
+    now = _now(now)
+    day = now.date()
+    while True:
+        hours = session(day)
+        if hours and hours[0] > now:
+            return hours[0]
+        day += timedelta(days=1)
+
+
+def next_close(now: datetime | None = None) -> datetime:
+    """The next regular session close strictly after now."""
+    now = _now(now)
+    day = now.date()
+    while True:
+        hours = session(day)
+        if hours and hours[1] > now:
+            return hours[1]
+        day += timedelta(days=1)
+
+
+def next_transition(now: datetime | None = None) -> datetime:
+    """When the market next opens or closes, whichever comes first."""
+    now = _now(now)
+    return next_close(now) if is_open(now) else next_open(now)
+
+
+def seconds_until_open(now: datetime | None = None) -> float:
+    """Seconds to wait for the next open, or 0 if the market is open now."""
+    now = _now(now)
+    return 0.0 if is_open(now) else (next_open(now) - now).total_seconds()
@@ -1,5 +1,6 @@
 from mcp.server.fastmcp import FastMCP
-from market import get_share_price
+from market import get_share_price_async, price_cache_stats
+import json
 
 mcp = FastMCP("market_server")
 
@@ -10,7 +11,12 @@ async def lookup_share_price(symbol: str) -> float:
     Args:
         symbol: the symbol of the stock
     """
-    return get_share_price(symbol)
+    return await get_share_price_async(symbol)
+
+@mcp.resource("market://price_cache/stats")
+async def read_price_cache_stats() -> str:
+    """Hit, miss, upstream fetch and wait counters for this process's shared price cache."""
+    return json.dumps(price_cache_stats)
 
 if __name__ == "__main__":
     mcp.run(transport='stdio')
\ No newline at end of file
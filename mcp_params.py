@@ -7,6 +7,8 @@ load_dotenv(override=True)
 brave_env = {"BRAVE_API_KEY": os.getenv("BRAVE_API_KEY")}
 polygon_api_key = os.getenv("POLYGON_API_KEY")
 tiingo_api_key = os.getenv("TIINGO_API_KEY")
+# URL of a shared accounts service, e.g. http://127.0.0.1:8010/mcp (streamable HTTP) or .../sse
+accounts_server_url = os.getenv("ACCOUNTS_SERVER_URL")
 
 # The MCP server for the Trader to read Market Data
 
@@ -27,10 +29,17 @@ mcp_trader_server = {
     "env": {"TIINGO_API_KEY": tiingo_api_key}
 }
 
+# The MCP server for the Trader's account: one shared HTTP service if configured, else a private process
+
+if accounts_server_url:
+    accounts_mcp = {"url": accounts_server_url}
+else:
+    accounts_mcp = {"command": "uv", "args": ["run", "accounts_server.py"]}
+
 # The full set of MCP servers for the trader: Accounts, Push Notification, Market, and Technical Analysis
 
 trader_mcp_server_params = [
-    {"command": "uv", "args": ["run", "accounts_server.py"]},
+    accounts_mcp,
     {"command": "uv", "args": ["run", "push_server.py"]},
     market_mcp,
     mcp_trader_server,
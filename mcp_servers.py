@@ -0,0 +1,131 @@
+import asyncio
+import json
+import time
+from contextlib import suppress
+from agents.mcp import MCPServer, MCPServerSse, MCPServerStdio, MCPServerStreamableHttp
+from session_pool import HEALTH_CHECK_SECONDS, HEALTH_CHECK_TIMEOUT
+
+# Generous because the first call after a restart may include package installs by uvx/npx
+CLIENT_SESSION_TIMEOUT_SECONDS = 120
+
+
+def make_server(params: dict) -> MCPServer:
+    """An MCP server for launch parameters, or for a {"url": ...} pointing at a running service."""
+    if "url" in params:
+        server_class = MCPServerSse if params["url"].rstrip("/").endswith("/sse") else MCPServerStreamableHttp
+    else:
+        server_class = MCPServerStdio
+    return server_class(params, client_session_timeout_seconds=CLIENT_SESSION_TIMEOUT_SECONDS, cache_tools_list=True)
+
+
+def describe(params: dict) -> str:
+    return params.get("url") or " ".join([params["command"], *params.get("args", [])])
+
+
+def server_key(params: dict) -> str:
+    """Servers with identical launch parameters are the same server and can be shared."""
+    return json.dumps(params, sort_keys=True)
+
+
+class ManagedServer:
+    """
+    One MCP server connection (and for stdio, its process) kept open across trading cycles. It
+    is opened and closed from its own task, because the client transport must be entered and
+    exited in the same task while agents in many different tasks use the session.
+    """
+
+    def __init__(self, params: dict):
+        self.params = params
+        self.server: MCPServer | None = None
+        self.starts = 0
+        self.last_checked = 0.0
+        self._task: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+        self._lock = asyncio.Lock()
+
+    def is_running(self) -> bool:
+        return self.server is not None and self._task is not None and not self._task.done()
+
+    async def _start(self) -> None:
+        server = make_server(self.params)
+        ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        errors = []
+
+        async def own():
+            try:
+                await server.connect()
+                self.server = server
+                ready.set()
+                await self._stop.wait()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self.server = None
+                with suppress(Exception):
+                    await server.cleanup()
+                ready.set()
+
+        self._task = asyncio.create_task(own())
+        await ready.wait()
+        if not self.is_running():
+            raise ConnectionError(f"Could not start MCP server {describe(self.params)}: {errors[0] if errors else 'exited'}")
+        self.starts += 1
+        self.last_checked = time.monotonic()
+
+    async def _is_healthy(self) -> bool:
+        if not self.is_running():
+            return False
+        if time.monotonic() - self.last_checked < HEALTH_CHECK_SECONDS:
+            return True
+        try:
+            await asyncio.wait_for(self.server.session.send_ping(), timeout=HEALTH_CHECK_TIMEOUT)
+        except Exception:
+            return False
+        self.last_checked = time.monotonic()
+        return True
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stop.set()
+            with suppress(Exception, asyncio.CancelledError):
+                await self._task
+        self._task = None
+        self.server = None
+
+    async def ensure(self) -> MCPServer:
+        """Return the running server, starting it or replacing a crashed one first."""
+        async with self._lock:
+            if not await self._is_healthy():
+                if self.starts:
+                    print(f"Restarting MCP server {describe(self.params)}")
+                await self.stop()
+                await self._start()
+            return self.server
+
+
+class MCPServerManager:
+    """
+    The trading floor's MCP servers, started once and kept alive between cycles. Servers with
+    the same parameters are shared by every trader that asks for them, so stateless servers run
+    once for the whole floor while a trader-specific one (like each researcher's memory
+    database) gets its own process.
+    """
+
+    def __init__(self):
+        self._servers: dict[str, ManagedServer] = {}
+
+    async def get(self, params_list: list[dict]) -> list[MCPServer]:
+        managed = [self._servers.setdefault(server_key(params), ManagedServer(params)) for params in params_list]
+        return list(await asyncio.gather(*(server.ensure() for server in managed)))
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "servers": len(self._servers),
+            "running": sum(server.is_running() for server in self._servers.values()),
+            "restarts": sum(max(server.starts - 1, 0) for server in self._servers.values()),
+        }
+
+    async def close(self) -> None:
+        await asyncio.gather(*(server.stop() for server in self._servers.values()))
+        self._servers.clear()
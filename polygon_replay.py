@@ -0,0 +1,160 @@
+"""
+Record and replay Polygon API traffic so the trading floor can run and be benchmarked offline.
+
+Set POLYGON_TRANSPORT=record to pass requests through to Polygon and save every response
+in POLYGON_CASSETTE_DIR, then POLYGON_TRANSPORT=replay to serve those responses locally
+with optional latency and error injection. Replay keeps the retry policy of the pool it
+replaces, so injected 429s and 5xx are retried with the same backoff as live traffic.
+Put these in .env so the MCP server processes pick them up too.
+"""
+from dotenv import load_dotenv
+from urllib.parse import urlencode, urlsplit
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+load_dotenv(override=True)
+
+POLYGON_TRANSPORT = os.getenv("POLYGON_TRANSPORT", "live").strip().lower()
+POLYGON_CASSETTE_DIR = os.getenv("POLYGON_CASSETTE_DIR", "polygon_cassette")
+REPLAY_LATENCY_MS = float(os.getenv("POLYGON_REPLAY_LATENCY_MS", "0"))
+REPLAY_JITTER_MS = float(os.getenv("POLYGON_REPLAY_JITTER_MS", "0"))
+REPLAY_ERROR_RATE = float(os.getenv("POLYGON_REPLAY_ERROR_RATE", "0"))
+REPLAY_ERROR_STATUS = int(os.getenv("POLYGON_REPLAY_ERROR_STATUS", "429"))
+REPLAY_SEED = os.getenv("POLYGON_REPLAY_SEED")
+
+
+def request_key(method: str, url: str, fields: dict | None) -> str:
+    """Identify a request by method, path and query, ignoring host and credentials."""
+    parts = urlsplit(url)
+    query = sorted((k, str(v)) for k, v in (fields or {}).items() if k != "apiKey")
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    return f"{method} {path}?{urlencode(query)}"
+
+
+def _cassette_file(directory: str, key: str) -> str:
+    return os.path.join(directory, hashlib.sha1(key.encode()).hexdigest()[:20] + ".json")
+
+
+class ReplayResponse:
+    """The parts of urllib3's HTTPResponse that the polygon client reads."""
+
+    def __init__(self, status: int, data: bytes, headers: dict | None = None):
+        self.status = status
+        self.data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.data)
+
+    def get_redirect_location(self):
+        return False
+
+
+class RecordingTransport:
+    """Wraps the client's real PoolManager and saves each successful response to the cassette."""
+
+    def __init__(self, pool, directory: str = POLYGON_CASSETTE_DIR):
+        self.pool = pool
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def request(self, method, url, fields=None, headers=None, **kwargs):
+        resp = self.pool.request(method, url, fields=fields, headers=headers, **kwargs)
+        if resp.status == 200:
+            key = request_key(method, url, fields)
+            record = {"key": key, "status": resp.status, "body": resp.data.decode("utf-8")}
+            path = _cassette_file(self.directory, key)
+            with open(path + ".tmp", "w") as f:
+                json.dump(record, f)
+            os.replace(path + ".tmp", path)
+        return resp
+
+
+class ReplayTransport:
+    """
+    Serves recorded responses, with configurable latency and injected errors. Given the
+    replaced pool's Retry policy, retryable responses are retried the way urllib3 would.
+    """
+
+    def __init__(
+        self,
+        directory: str = POLYGON_CASSETTE_DIR,
+        retries: Retry | int | None = None,
+        latency_ms: float = REPLAY_LATENCY_MS,
+        jitter_ms: float = REPLAY_JITTER_MS,
+        error_rate: float = REPLAY_ERROR_RATE,
+        error_status: int = REPLAY_ERROR_STATUS,
+        seed: str | None = REPLAY_SEED,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retries = Retry.from_int(retries) if retries is not None else None
+        self.requests = 0
+        self.misses = 0
+        self.errors = 0
+        self.retried = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.responses = {}
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                if filename.endswith(".json"):
+                    with open(os.path.join(directory, filename)) as f:
+                        record = json.load(f)
+                    self.responses[record["key"]] = (record["status"], record["body"].encode("utf-8"))
+
+    def request(self, method, url, fields=None, headers=None, **kwargs):
+        key = request_key(method, url, fields)
+        retries = self.retries
+        while True:
+            resp = self._serve(key)
+            if retries is None or not retries.is_retry(method, resp.status, "Retry-After" in resp.headers):
+                return resp
+            try:
+                retries = retries.increment(method, url, response=resp)
+            except MaxRetryError:
+                if retries.raise_on_status:
+                    raise
+                return resp
+            with self._lock:
+                self.retried += 1
+            retries.sleep(resp)
+
+    def _serve(self, key: str) -> ReplayResponse:
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms))
+            fail = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000)
+        if fail:
+            with self._lock:
+                self.errors += 1
+            return ReplayResponse(self.error_status, json.dumps({"status": "ERROR", "error": "injected"}).encode())
+        if key not in self.responses:
+            with self._lock:
+                self.misses += 1
+            return ReplayResponse(404, json.dumps({"status": "NOT_FOUND", "error": f"not recorded: {key}"}).encode())
+        status, body = self.responses[key]
+        return ReplayResponse(status, body)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"recorded": len(self.responses), "requests": self.requests, "misses": self.misses, "errors": self.errors, "retried": self.retried}
+
+
+def install(client, transport: str = POLYGON_TRANSPORT):
+    """Swap the transport of a polygon RESTClient according to POLYGON_TRANSPORT."""
+    if transport == "record":
+        client.client = RecordingTransport(client.client)
+    elif transport == "replay":
+        client.client = ReplayTransport(retries=client.client.connection_pool_kw.get("retries"))
+    return client
@@ -1,4 +1,11 @@
+import atexit
+import json
 import os
+import queue
+import random
+import sys
+import threading
+import time
 from dotenv import load_dotenv
 import requests
 from pydantic import BaseModel, Field
@@ -8,23 +15,232 @@ load_dotenv(override=True)
 
 pushover_user = os.getenv("PUSHOVER_USER")
 pushover_token = os.getenv("PUSHOVER_TOKEN")
-pushover_url = "https://api.pushover.net/1/messages.json"
+# Point at a local stand-in to exercise delivery without sending real notifications
+pushover_url = os.getenv("PUSHOVER_URL", "https://api.pushover.net/1/messages.json")
 
+# Messages from one trader within this many seconds of its first go out as one digest
+PUSH_DIGEST_SECONDS = float(os.getenv("PUSH_DIGEST_SECONDS", "30"))
+# Pushover asks for messages to be sent one at a time, so deliveries are spaced at least this far apart
+PUSH_MIN_INTERVAL_SECONDS = float(os.getenv("PUSH_MIN_INTERVAL_SECONDS", "1"))
+PUSH_TIMEOUT = float(os.getenv("PUSH_TIMEOUT", "10"))
+PUSH_MAX_RETRIES = int(os.getenv("PUSH_MAX_RETRIES", "4"))
+PUSH_BACKOFF_SECONDS = float(os.getenv("PUSH_BACKOFF_SECONDS", "2"))
+PUSH_QUEUE_SIZE = int(os.getenv("PUSH_QUEUE_SIZE", "1000"))
+
+# Pushover's limits on message and title length
+MAX_MESSAGE_LENGTH = 1024
+MAX_TITLE_LENGTH = 250
+
+_FLUSH = object()
+_STOP = object()
+
+
+class PushQueue:
+    """
+    Background delivery of push notifications: the tool call queues a message and returns at
+    once, while a worker thread groups each named trader's messages into one digest per
+    PUSH_DIGEST_SECONDS and sends them one at a time, retrying throttled or failed requests
+    with backoff and dropping them while Pushover reports the app's quota is used up.
+    Unnamed messages cannot be told apart by sender, so each is sent on its own.
+    """
+
+    def __init__(
+        self,
+        url: str = pushover_url,
+        user: str | None = pushover_user,
+        token: str | None = pushover_token,
+        digest_seconds: float = PUSH_DIGEST_SECONDS,
+        min_interval: float = PUSH_MIN_INTERVAL_SECONDS,
+        timeout: float = PUSH_TIMEOUT,
+        max_retries: int = PUSH_MAX_RETRIES,
+        backoff_seconds: float = PUSH_BACKOFF_SECONDS,
+        max_queue: int = PUSH_QUEUE_SIZE,
+    ):
+        self.url = url
+        self.user = user
+        self.token = token
+        self.digest_seconds = digest_seconds
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.enqueued = 0
+        self.dropped = 0
+        self.sent = 0
+        self.digested = 0
+        self.retries = 0
+        self.failed = 0
+        self._session = requests.Session()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        # name -> (monotonic time of its first waiting message, messages)
+        self._pending: dict[str, tuple[float, list[str]]] = {}
+        self._next_send_at = 0.0
+        # Epoch time until which Pushover has said the app has no messages left
+        self._quota_reset_at = 0.0
+        self._worker = threading.Thread(target=self._run, name="push-queue", daemon=True)
+        self._worker.start()
+
+    def submit(self, name: str, message: str) -> bool:
+        """Queue a message from a trader, returning False if it was dropped because the queue is full."""
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait((name, message))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def flush(self) -> None:
+        """Send every waiting digest now and block until they have been delivered or given up on."""
+        if not self._closed and self._worker.is_alive():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def close(self) -> None:
+        """Send what is waiting and stop the worker thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._worker.is_alive():
+            self._queue.put(_STOP)
+            self._worker.join()
+        self._session.close()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "waiting": sum(len(messages) for _, messages in list(self._pending.values())),
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "sent": self.sent,
+                "digested": self.digested,
+                "retries": self.retries,
+                "failed": self.failed,
+            }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            timeout = None
+            if self._pending:
+                first = min(since for since, _ in self._pending.values())
+                timeout = max(0.0, first + self.digest_seconds - time.monotonic())
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                entry = None
+            if entry is _STOP:
+                stopping = True
+            elif entry is not None and entry is not _FLUSH:
+                name, message = entry
+                if name:
+                    with self._lock:
+                        self._pending.setdefault(name, (time.monotonic(), []))[1].append(message)
+                else:
+                    # Without a name there is no telling whose messages belong together
+                    self._send(name, [message])
+            now = time.monotonic()
+            send_all = stopping or entry is _FLUSH
+            for name in [name for name, (since, _) in self._pending.items() if send_all or now - since >= self.digest_seconds]:
+                with self._lock:
+                    _, messages = self._pending.pop(name)
+                self._send(name, messages)
+            if entry is not None:
+                self._queue.task_done()
+        # Messages that raced in behind the stop marker
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _FLUSH and entry is not _STOP:
+                name, message = entry
+                self._send(name, [message])
+            self._queue.task_done()
+
+    def _send(self, name: str, messages: list[str]) -> None:
+        if len(messages) == 1:
+            title, message = name, messages[0]
+        else:
+            title = f"{name} ({len(messages)} updates)" if name else f"{len(messages)} updates"
+            message = "\n".join(f"• {message}" for message in messages)
+        if len(message) > MAX_MESSAGE_LENGTH:
+            message = message[:MAX_MESSAGE_LENGTH - 1] + "…"
+        payload = {"user": self.user, "token": self.token, "message": message}
+        if title:
+            payload["title"] = title[:MAX_TITLE_LENGTH]
+        if self._deliver(payload):
+            with self._lock:
+                self.sent += 1
+                self.digested += len(messages) - 1
+        else:
+            with self._lock:
+                self.failed += len(messages)
+
+    def _deliver(self, payload: dict) -> bool:
+        for attempt in range(self.max_retries + 1):
+            if time.time() < self._quota_reset_at:
+                print("Pushover quota used up; dropping notification", file=sys.stderr)
+                return False
+            time.sleep(max(0.0, self._next_send_at - time.monotonic()))
+            retry_after = None
+            try:
+                response = self._session.post(self.url, data=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = str(e)
+            else:
+                self._next_send_at = time.monotonic() + self.min_interval
+                if response.headers.get("X-Limit-App-Remaining") == "0":
+                    self._quota_reset_at = float(response.headers.get("X-Limit-App-Reset", 0))
+                if response.status_code == 200:
+                    return True
+                error = f"{response.status_code} {response.text[:200]}"
+                if response.status_code != 429 and response.status_code < 500:
+                    # Pushover rejected the request itself, e.g. bad credentials, so retrying cannot help
+                    print(f"Pushover rejected notification: {error}", file=sys.stderr)
+                    return False
+                retry_after = response.headers.get("Retry-After")
+            if attempt == self.max_retries:
+                break
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff_seconds * 2 ** attempt
+            print(f"Push failed ({error}), retrying in {delay:.1f}s", file=sys.stderr)
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay + random.uniform(0, self.backoff_seconds / 2))
+        print(f"Giving up on notification after {self.max_retries + 1} attempts", file=sys.stderr)
+        return False
+
+
+notifier = PushQueue()
+atexit.register(notifier.close)
 
 mcp = FastMCP("push_server")
 
 
 class PushModelArgs(BaseModel):
     message: str = Field(description="A brief message to push")
+    name: str = Field(default="", description="Your name, so that your messages can be sent together; without it each message is sent on its own")
 
 
 @mcp.tool()
 def push(args: PushModelArgs):
     """Send a push notification with this brief message"""
     print(f"Push: {args.message}")
-    payload = {"user": pushover_user, "token": pushover_token, "message": args.message}
-    requests.post(pushover_url, data=payload)
-    return "Push notification sent"
+    if not notifier.submit(args.name, args.message):
+        return "Push notification dropped: too many notifications are waiting"
+    return "Push notification queued"
+
+
+@mcp.resource("push://stats")
+async def read_push_stats() -> str:
+    return json.dumps(notifier.stats())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+"""
+Target-weight rebalancing: turn a portfolio and a set of target weights into the smallest set
+of whole-share orders that moves the portfolio to those weights without overdrawing cash.
+"""
+import numpy as np
+
+
+def plan_rebalance(
+    holdings: np.ndarray,
+    prices: np.ndarray,
+    cash: float,
+    weights: np.ndarray,
+    spread: float,
+    tolerance: float = 0.0,
+    other_value: float = 0.0,
+) -> np.ndarray:
+    """
+    Share deltas (positive to buy, negative to sell) that bring each position close to its target
+    weight of the portfolio's value, paying the spread on both sides.
+
+    Args:
+        holdings: Shares held of each symbol
+        prices: Mid price of each symbol
+        cash: Cash available before the trades
+        weights: Target fraction of total value per symbol; whatever is left over stays in cash
+        spread: Fraction added to the price when buying and taken off when selling
+        tolerance: Positions already within this many weight points of target are left alone;
+            positions with a target weight of zero are always sold
+        other_value: Value held outside cash and these positions, such as cash in other
+            currencies; it counts towards the total the weights apply to but is never spent
+
+    Returns:
+        np.ndarray: Integer share deltas in the same order as the inputs
+    """
+    holdings = holdings.astype(np.int64)
+    total = cash + other_value + holdings @ prices
+    if total <= 0:
+        return np.zeros_like(holdings)
+    buy_prices, sell_prices = prices * (1 + spread), prices * (1 - spread)
+    drift = holdings * prices / total - weights
+
+    # Sell down to the floor of the target, and buy up to it at the ask so the spread is paid for
+    target_value = weights * total
+    sell_target = np.floor(target_value / prices).astype(np.int64)
+    buy_target = np.floor(target_value / buy_prices).astype(np.int64)
+    deltas = np.where(holdings > sell_target, sell_target - holdings, np.maximum(buy_target - holdings, 0))
+    deltas[(np.abs(drift) <= tolerance) & (weights > 0)] = 0
+
+    def cash_after(deltas):
+        return cash - np.where(deltas > 0, deltas * buy_prices, deltas * sell_prices).sum()
+
+    # Rounding the buys at the ask can still overdraw after the spread on the sells; trim the
+    # buy that would end furthest over its target until the cash covers the rest
+    remaining = cash_after(deltas)
+    while remaining < 0:
+        buys = np.flatnonzero(deltas > 0)
+        over = (holdings[buys] + deltas[buys]) * prices[buys] / total - weights[buys]
+        i = buys[np.argmax(over)]
+        deltas[i] -= 1
+        remaining += buy_prices[i]
+
+    # Spend leftover cash on single shares of the most underweight positions while they fit
+    # and the extra share brings the position nearer its target
+    while True:
+        shares = holdings + deltas
+        gap = target_value - shares * prices
+        candidates = np.flatnonzero((deltas >= 0) & (gap > prices / 2) & (buy_prices <= remaining) & (np.abs(drift) > tolerance))
+        if candidates.size == 0:
+            break
+        i = candidates[np.argmax(gap[candidates] / total)]
+        deltas[i] += 1
+        remaining -= buy_prices[i]
+    return deltas
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+from contextlib import suppress
+from dotenv import load_dotenv
+import mcp
+from mcp import StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+load_dotenv(override=True)
+
+# Sessions idle for longer than this are pinged before reuse
+HEALTH_CHECK_SECONDS = float(os.getenv("MCP_HEALTH_CHECK_SECONDS", "30"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("MCP_HEALTH_CHECK_TIMEOUT", "5"))
+
+
+def open_transport(params: StdioServerParameters | str):
+    """Client streams for a stdio server, or for the URL of a streamable HTTP (or .../sse) service."""
+    if isinstance(params, str):
+        return sse_client(params) if params.rstrip("/").endswith("/sse") else streamablehttp_client(params)
+    return stdio_client(params)
+
+
+class PooledSession:
+    """One long-lived MCP client session whose server process is owned by a background task."""
+
+    def __init__(self, params: StdioServerParameters | str):
+        self.params = params
+        self.session: mcp.ClientSession | None = None
+        self.last_used = 0.0
+        self._task: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+
+    def is_connected(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def connect(self) -> None:
+        ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        errors = []
+
+        # The stdio and session context managers must be entered and exited in the same task
+        async def own():
+            try:
+                async with open_transport(self.params) as (read, write, *_):
+                    async with mcp.ClientSession(read, write) as session:
+                        await session.initialize()
+                        self.session = session
+                        ready.set()
+                        await self._stop.wait()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self.session = None
+                ready.set()
+
+        self._task = asyncio.create_task(own())
+        await ready.wait()
+        if not self.is_connected():
+            raise ConnectionError(f"Could not start MCP server {getattr(self.params, 'args', self.params)}: {errors[0] if errors else 'exited'}")
+        self.last_used = time.monotonic()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._stop.set()
+            with suppress(Exception, asyncio.CancelledError):
+                await self._task
+        self._task = None
+        self.session = None
+
+    async def is_healthy(self) -> bool:
+        if not self.is_connected():
+            return False
+        if time.monotonic() - self.last_used < HEALTH_CHECK_SECONDS:
+            return True
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=HEALTH_CHECK_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+
+class SessionPool:
+    """
+    A fixed number of reusable MCP client sessions to one server. Sessions connect on
+    first use, are health-checked when idle, and reconnect automatically if their server dies.
+    """
+
+    def __init__(self, params: StdioServerParameters | str, size: int = 2):
+        self.params = params
+        self.size = size
+        self.reconnects = 0
+        self._sessions = [PooledSession(params) for _ in range(size)]
+        self._idle: asyncio.Queue[PooledSession] = asyncio.Queue()
+        for pooled in self._sessions:
+            self._idle.put_nowait(pooled)
+
+    async def run(self, operation):
+        """Run operation(session) on a pooled session, reconnecting and retrying once if the server died."""
+        for attempt in range(2):
+            pooled = await self._idle.get()
+            try:
+                if not await pooled.is_healthy():
+                    if pooled.last_used:
+                        self.reconnects += 1
+                    await pooled.close()
+                    await pooled.connect()
+                result = await operation(pooled.session)
+                pooled.last_used = time.monotonic()
+                return result
+            except Exception:
+                # An error from a live server is the caller's problem; a dead transport is retried
+                if pooled.is_connected() or attempt:
+                    raise
+                await pooled.close()
+            finally:
+                self._idle.put_nowait(pooled)
+
+    async def close(self) -> None:
+        for pooled in self._sessions:
+            await pooled.close()
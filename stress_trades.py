@@ -0,0 +1,115 @@
+"""
+Stress test trade execution: many processes buy and sell against the same few accounts at
+once, then the stored balances and holdings are checked against the transaction ledger so
+any lost or partial update shows up, and the overall trade rate is reported.
+
+Runs against a throwaway database in a temporary directory, never accounts.db.
+
+    uv run stress_trades.py [--processes 8] [--trades 2000] [--accounts 2]
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import database
+
+INITIAL_BALANCE = 10_000.0
+PRICES = {"AAPL": 190.0, "MSFT": 410.0, "NVDA": 120.0, "SPY": 520.0}
+TOLERANCE = 1e-6
+
+
+def trade(args: tuple[str, int, int, int]) -> dict[str, int]:
+    """Run one worker's share of random trades and count the outcomes per account."""
+    path, seed, trades, accounts = args
+    database.use_database(path)
+    rng = random.Random(seed)
+    outcomes = {"filled": 0, "rejected": 0}
+    filled = {}
+    for _ in range(trades):
+        name = f"stress{rng.randrange(accounts)}"
+        symbol = rng.choice(list(PRICES))
+        quantity = rng.randint(1, 5) * (1 if rng.random() < 0.55 else -1)
+        transaction = {
+            "symbol": symbol,
+            "quantity": quantity,
+            "price": PRICES[symbol],
+            "timestamp": "2025-01-01 00:00:00",
+            "rationale": f"worker {seed}",
+        }
+        try:
+            database.write_trade(name, transaction)
+            outcomes["filled"] += 1
+            filled[name] = filled.get(name, 0) + 1
+        except ValueError:
+            outcomes["rejected"] += 1
+    database.close_connections()
+    return {**outcomes, "per_account": filled}
+
+
+def check(accounts: int, filled: dict[str, int]) -> list[str]:
+    """Compare each account's stored state with what its transaction ledger implies."""
+    problems = []
+    for i in range(accounts):
+        name = f"stress{i}"
+        account = database.read_account(name)
+        transactions = account["transactions"]
+        if len(transactions) != filled.get(name, 0):
+            problems.append(f"{name}: {filled.get(name, 0)} trades filled but {len(transactions)} recorded")
+        balance = INITIAL_BALANCE - sum(t["quantity"] * t["price"] for t in transactions)
+        if abs(balance - account["balance"]) > TOLERANCE:
+            problems.append(f"{name}: balance {account['balance']:.2f}, ledger says {balance:.2f}")
+        if account["balance"] < -TOLERANCE:
+            problems.append(f"{name}: negative balance {account['balance']:.2f}")
+        for symbol in PRICES:
+            held = sum(t["quantity"] for t in transactions if t["symbol"] == symbol)
+            if held != account["holdings"].get(symbol, 0):
+                problems.append(f"{name}: holds {account['holdings'].get(symbol, 0)} {symbol}, ledger says {held}")
+            if held < 0:
+                problems.append(f"{name}: short {held} {symbol}")
+    return problems
+
+
+def run(processes: int, trades: int, accounts: int) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stress.db")
+        database.use_database(path)
+        for i in range(accounts):
+            database.write_account(f"stress{i}", {
+                "balance": INITIAL_BALANCE, "strategy": "", "holdings": {},
+                "transactions": [], "portfolio_value_time_series": [],
+            })
+
+        print(f"{processes} processes x {trades} trades over {accounts} account(s)")
+        jobs = [(path, seed, trades, accounts) for seed in range(processes)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(trade, jobs))
+            elapsed = time.perf_counter() - start
+
+        filled = {}
+        for result in results:
+            for name, count in result["per_account"].items():
+                filled[name] = filled.get(name, 0) + count
+        total_filled = sum(result["filled"] for result in results)
+        total_rejected = sum(result["rejected"] for result in results)
+        print(f"  filled {total_filled:,}, rejected {total_rejected:,} (insufficient cash or shares)")
+        print(f"  {(total_filled + total_rejected) / elapsed:,.0f} trades/sec")
+
+        problems = check(accounts, filled)
+        database.close_connections()
+        for problem in problems:
+            print(f"  LOST UPDATE {problem}")
+        print("  ledger consistent" if not problems else f"  {len(problems)} inconsistencies")
+        return not problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--trades", type=int, default=2000, help="trades per process")
+    parser.add_argument("--accounts", type=int, default=2, help="fewer accounts means more contention")
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args.processes, args.trades, args.accounts) else 1)
@@ -0,0 +1,207 @@
+"""
+Seeded synthetic market used when there is no Polygon key.
+
+Every symbol follows its own jump-diffusion path: geometric Brownian motion with
+per-symbol drift and volatility, plus occasional overnight jumps. Prices are a pure
+function of (seed, symbol, tick), so every process sees the same price for a symbol
+within a tick, and a whole universe of symbols is priced with a few vectorized NumPy
+operations.
+
+Paths are built in two levels so any tick can be reached without simulating every
+tick since the epoch: one Gaussian step per day gives daily anchors, and within a day
+an exact Brownian bridge between those anchors is built from per-tick draws.
+"""
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+
+load_dotenv(override=True)
+
+SYNTHETIC_SEED = int(os.getenv("SYNTHETIC_SEED", "42"))
+SYNTHETIC_TICK_SECONDS = float(os.getenv("SYNTHETIC_TICK_SECONDS", "60"))
+SYNTHETIC_EPOCH = os.getenv("SYNTHETIC_EPOCH", "2024-01-01")
+
+DAYS_PER_YEAR = 365.0
+# Draws per chunk when generating many days or ticks at once, to bound memory
+CHUNK = 256
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+# Streams of random numbers per symbol; each is an independent sequence indexed by a counter
+_DAILY, _JUMP_TIME, _JUMP_SIZE, _INTRADAY, _PARAMS = range(5)
+
+
+def _splitmix(x: np.ndarray) -> np.ndarray:
+    with np.errstate(over="ignore"):
+        x = x + _GOLDEN
+        x = (x ^ (x >> np.uint64(30))) * _MIX1
+        x = (x ^ (x >> np.uint64(27))) * _MIX2
+        return x ^ (x >> np.uint64(31))
+
+
+def _uniforms(keys: np.ndarray, stream: int, counters: np.ndarray) -> np.ndarray:
+    """Uniforms in (0, 1) for each (counter, symbol key): shape (len(counters), len(keys))."""
+    with np.errstate(over="ignore"):
+        c = _splitmix(counters.astype(np.uint64) * np.uint64(8) + np.uint64(stream))
+        bits = _splitmix(keys[None, :] ^ c[:, None])
+    return ((bits >> np.uint64(11)).astype(np.float64) + 0.5) / float(1 << 53)
+
+
+def _normals(keys: np.ndarray, stream: int, counters: np.ndarray) -> np.ndarray:
+    """Standard normals for each (counter, symbol key), via Box-Muller on two uniform streams."""
+    u1 = _uniforms(keys, stream, counters * 2)
+    u2 = _uniforms(keys, stream, counters * 2 + 1)
+    return np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+
+
+def _symbol_key(symbol: str, seed: int) -> int:
+    digest = hashlib.sha1(f"{seed}:{symbol.upper()}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class SyntheticMarket:
+    def __init__(
+        self,
+        seed: int = SYNTHETIC_SEED,
+        tick_seconds: float = SYNTHETIC_TICK_SECONDS,
+        epoch: str = SYNTHETIC_EPOCH,
+        jump_rate: float = 0.02,
+        jump_mean: float = 0.0,
+        jump_std: float = 0.05,
+    ):
+        self.seed = seed
+        self.tick_seconds = tick_seconds
+        self.ticks_per_day = max(1, int(round(86400 / tick_seconds)))
+        self.epoch = datetime.fromisoformat(epoch).replace(tzinfo=timezone.utc).timestamp()
+        self.jump_rate = jump_rate
+        self.jump_mean = jump_mean
+        self.jump_std = jump_std
+        self.symbols: list[str] = []
+        self._index: dict[str, int] = {}
+        self._keys = np.zeros(0, dtype=np.uint64)
+        self._log_s0 = self._mu = self._sigma = np.zeros(0)
+        self._lock = threading.Lock()
+        self._reset_cache()
+
+    def _reset_cache(self) -> None:
+        self._day = None
+        self._tick = None
+        self._log_prices = None
+
+    def add_symbols(self, symbols) -> None:
+        with self._lock:
+            new = [s for s in dict.fromkeys(symbols) if s not in self._index]
+            if not new:
+                return
+            for symbol in new:
+                self._index[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+            added = slice(len(self._keys), None)
+            keys = np.array([_symbol_key(s, self.seed) for s in new], dtype=np.uint64)
+            self._keys = np.concatenate([self._keys, keys])
+            params = _uniforms(keys, _PARAMS, np.arange(3))
+            # Start between $10 and $500 (log-uniform), drift -5%..15%, volatility 15%..60% a year
+            self._log_s0 = np.concatenate([self._log_s0, np.log(10.0) + params[0] * np.log(50.0)])
+            self._mu = np.concatenate([self._mu, -0.05 + 0.20 * params[1]])
+            self._sigma = np.concatenate([self._sigma, 0.15 + 0.45 * params[2]])
+            if self._day is not None:
+                self._extend_day(added)
+
+    def _extend_day(self, added: slice) -> None:
+        """Bring newly added symbols up to the cached day and tick, leaving existing ones as they are."""
+        day = self._day
+        diffusion, _ = self._day_steps(np.array([day], dtype=np.int64), added)
+        self._day_start = np.concatenate([self._day_start, self._anchor(day, added)])
+        self._day_diffusion = np.concatenate([self._day_diffusion, diffusion[0]])
+        self._day_total = np.concatenate([self._day_total, self._intraday_sum(day, 0, self.ticks_per_day, added)])
+        done = self._tick - day * self.ticks_per_day + 1
+        self._partial = np.concatenate([self._partial, self._intraday_sum(day, 0, done, added)])
+        if self._log_prices is not None:
+            self._log_prices = np.concatenate([self._log_prices, self._bridge(done - 1, added)])
+
+    def tick_at(self, when: float | None = None) -> int:
+        """The tick index for an epoch time, defaulting to now."""
+        return int(((time.time() if when is None else when) - self.epoch) // self.tick_seconds)
+
+    # Each helper works on a slice of the universe's columns, so new symbols can be computed alone
+
+    def _day_steps(self, days: np.ndarray, cols: slice = slice(None)) -> tuple[np.ndarray, np.ndarray]:
+        """Diffusion and overnight jump log-returns for each of the given days."""
+        dt = 1.0 / DAYS_PER_YEAR
+        keys, mu, sigma = self._keys[cols], self._mu[cols], self._sigma[cols]
+        diffusion = (mu - 0.5 * sigma**2) * dt + sigma * np.sqrt(dt) * _normals(keys, _DAILY, days)
+        jumps = _uniforms(keys, _JUMP_TIME, days) < self.jump_rate
+        sizes = self.jump_mean + self.jump_std * _normals(keys, _JUMP_SIZE, days)
+        return diffusion, np.where(jumps, sizes, 0.0)
+
+    def _intraday_sum(self, day: int, start: int, stop: int, cols: slice = slice(None)) -> np.ndarray:
+        """Sum of the standard normal draws for ticks [start, stop) of a day."""
+        keys = self._keys[cols]
+        total = np.zeros(len(keys))
+        for lo in range(start, stop, CHUNK):
+            counters = np.arange(lo, min(lo + CHUNK, stop), dtype=np.int64) + day * self.ticks_per_day
+            total += _normals(keys, _INTRADAY, counters).sum(axis=0)
+        return total
+
+    def _anchor(self, day: int, cols: slice = slice(None)) -> np.ndarray:
+        """Log prices at the start of a day: the sum of every daily step and jump before it."""
+        log_price = self._log_s0[cols].copy()
+        for lo in range(0, max(day, 0), CHUNK):
+            diffusion, jumps = self._day_steps(np.arange(lo, min(lo + CHUNK, day), dtype=np.int64), cols)
+            log_price += diffusion.sum(axis=0) + jumps.sum(axis=0)
+        return log_price
+
+    def _bridge(self, offset: int, cols: slice = slice(None)) -> np.ndarray:
+        """Log prices at a tick of the cached day: a Brownian bridge from its anchor to the next, using the day's own tick draws."""
+        fraction = (offset + 1) / self.ticks_per_day
+        bridge = (self._partial[cols] - fraction * self._day_total[cols]) / np.sqrt(self.ticks_per_day)
+        dt = 1.0 / DAYS_PER_YEAR
+        return self._day_start[cols] + fraction * self._day_diffusion[cols] + self._sigma[cols] * np.sqrt(dt) * bridge
+
+    def log_prices_at_tick(self, tick: int) -> np.ndarray:
+        """Log prices of the whole universe at a tick."""
+        day, offset = divmod(tick, self.ticks_per_day)
+        if self._day != day:
+            diffusion, _ = self._day_steps(np.array([day], dtype=np.int64))
+            self._day = day
+            self._day_start = self._anchor(day)
+            self._day_diffusion = diffusion[0]
+            self._day_total = self._intraday_sum(day, 0, self.ticks_per_day)
+            self._tick, self._partial = day * self.ticks_per_day - 1, np.zeros(len(self._keys))
+        if self._tick != tick:
+            done = self._tick - day * self.ticks_per_day + 1
+            if offset + 1 >= done:
+                self._partial = self._partial + self._intraday_sum(day, done, offset + 1)
+            else:
+                self._partial = self._intraday_sum(day, 0, offset + 1)
+            self._tick = tick
+            self._log_prices = self._bridge(offset)
+        return self._log_prices
+
+    def prices(self, symbols, when: float | None = None) -> dict[str, float]:
+        """Prices for some symbols at an epoch time (default now), stable within a tick."""
+        symbols = list(symbols)
+        self.add_symbols(symbols)
+        with self._lock:
+            log_prices = self.log_prices_at_tick(self.tick_at(when))
+            indices = np.array([self._index[s] for s in symbols], dtype=np.int64)
+            values = np.round(np.exp(log_prices[indices]), 2)
+        return dict(zip(symbols, values.tolist()))
+
+    def universe_prices(self, when: float | None = None) -> np.ndarray:
+        """Prices for every symbol added so far, in the order of self.symbols."""
+        with self._lock:
+            return np.round(np.exp(self.log_prices_at_tick(self.tick_at(when))), 2)
+
+
+synthetic_market = SyntheticMarket()
+
+
+def get_synthetic_prices(symbols, when: float | None = None) -> dict[str, float]:
+    return synthetic_market.prices(symbols, when)
@@ -40,6 +40,7 @@ You actively manage your portfolio according to your strategy.
 You have access to tools including a researcher to research online for news and opportunities, based on your request.
 You also have tools to access to financial data for stocks. {note}
 And you have tools to buy and sell stocks using your account name {name}.
+To make several trades, use execute_orders to place them all in one call rather than buying and selling one stock at a time.
 
 TECHNICAL ANALYSIS TOOLS:
 You now have access to advanced technical analysis tools to enhance your trading decisions:
@@ -61,7 +62,7 @@ Use these technical analysis tools to:
 You can use your entity tools as a persistent memory to store and recall information; you share
 this memory with other traders and can benefit from the group's knowledge.
 Use these tools to carry out research, make decisions, and execute trades.
-After you've completed trading, send a push notification with a brief summary of activity, then reply with a 2-3 sentence appraisal.
+After you've completed trading, send a push notification with your name and a brief summary of activity, then reply with a 2-3 sentence appraisal.
 Your goal is to maximize your profits according to your strategy.
 """
 
@@ -109,6 +110,7 @@ TECHNICAL ANALYSIS FOR REBALANCING:
 6. Consider position_size to adjust allocation based on current volatility
 
 Finally, make your decision, then execute trades using the tools as needed.
+To move to new target weights, use the rebalance tool to preview the orders and then execute them in one call.
 You do not need to identify new investment opportunities at this time; you will be asked to do so later.
 Just rebalance your portfolio based on your strategy as needed.
 Your investment strategy:
@@ -1,12 +1,29 @@
 from agents import TracingProcessor, Trace, Span
-from database import write_log
+from database import write_logs
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import atexit
+import os
+import queue
 import secrets
 import string
+import threading
 import json
 import time
 
+load_dotenv(override=True)
+
 ALPHANUM = string.ascii_lowercase + string.digits 
 
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", "0.5"))
+# How long a span may block the agent waiting for room in a full queue before its log is dropped
+LOG_ENQUEUE_TIMEOUT = float(os.getenv("LOG_ENQUEUE_TIMEOUT", "0.05"))
+
+_FLUSH = object()
+_STOP = object()
+
 def make_trace_id(tag: str) -> str:
     """
     Return a string of the form 'trace_<tag><random>',
@@ -17,9 +34,134 @@ def make_trace_id(tag: str) -> str:
     random_suffix = ''.join(secrets.choice(ALPHANUM) for _ in range(pad_len))
     return f"trace_{tag}{random_suffix}"
 
+class LogSink:
+    """
+    Write-behind buffer for log rows: callers enqueue and return immediately, while a
+    background thread writes batches with executemany once LOG_BATCH_SIZE rows are
+    waiting or LOG_FLUSH_SECONDS have passed.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_seconds: float = LOG_FLUSH_SECONDS,
+        enqueue_timeout: float = LOG_ENQUEUE_TIMEOUT,
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.enqueue_timeout = enqueue_timeout
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._worker.start()
+
+    def write(self, name: str, type: str, message: str) -> bool:
+        """Queue a log row, returning False if it was dropped because the queue stayed full."""
+        if self._closed:
+            return False
+        when = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            self._queue.put((name, when, type, message), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def flush(self) -> None:
+        """Block until every row queued so far has been written."""
+        if not self._closed and self._worker.is_alive():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def close(self) -> None:
+        """Flush outstanding rows and stop the worker thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._worker.is_alive():
+            self._queue.put(_STOP)
+            self._worker.join()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            try:
+                entry = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                continue
+            batch, taken = [], 1
+            deadline = time.monotonic() + self.flush_seconds
+            while True:
+                if entry is _STOP:
+                    stopping = True
+                elif entry is not _FLUSH:
+                    batch.append(entry)
+                if entry is _STOP or entry is _FLUSH or len(batch) >= self.batch_size:
+                    break
+                try:
+                    entry = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                taken += 1
+            self._write(batch)
+            for _ in range(taken):
+                self._queue.task_done()
+        # Rows that raced in behind the stop marker
+        leftover = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _FLUSH and entry is not _STOP:
+                leftover.append(entry)
+            self._queue.task_done()
+        self._write(leftover)
+
+    def _write(self, batch: list[tuple[str, str, str, str]]) -> None:
+        if not batch:
+            return
+        try:
+            write_logs(batch)
+        except Exception as e:
+            print(f"Failed to write {len(batch)} log entries: {e}")
+            with self._lock:
+                self.failed += len(batch)
+            return
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+
+
 class LogTracer(TracingProcessor):
-    def __init__(self):
+    def __init__(self, sink: LogSink | None = None):
         self.tool_start_times = {}
+        self.sink = sink or LogSink()
+        atexit.register(self.shutdown)
+
+    def write_log(self, name: str, type: str, message: str) -> None:
+        self.sink.write(name, type, message)
 
     def get_name(self, trace_or_span: Trace | Span) -> str | None:
         trace_id = trace_or_span.trace_id
@@ -32,12 +174,12 @@ class LogTracer(TracingProcessor):
     def on_trace_start(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Started: {trace.name}")
+            self.write_log(name, "trace", f"Started: {trace.name}")
 
     def on_trace_end(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Ended: {trace.name}")
+            self.write_log(name, "trace", f"Ended: {trace.name}")
 
     def on_span_start(self, span) -> None:
         name = self.get_name(span)
@@ -54,7 +196,7 @@ class LogTracer(TracingProcessor):
                 message = f"🔧 {tool_name}"
                 if hasattr(span.span_data, "server") and span.span_data.server:
                     message += f" [{span.span_data.server}]"
-                write_log(name, "mcp_tool", f"{message} - Starting...")
+                self.write_log(name, "mcp_tool", f"{message} - Starting...")
                 return
             
             # Regular span logging for non-tool calls
@@ -68,7 +210,7 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            self.write_log(name, type, message)
 
     def on_span_end(self, span) -> None:
         name = self.get_name(span)
@@ -102,7 +244,7 @@ class LogTracer(TracingProcessor):
                 if span.error:
                     message += f" Error: {span.error}"
                     
-                write_log(name, "mcp_tool", message)
+                self.write_log(name, "mcp_tool", message)
                 return
             
             # Regular span logging for non-tool calls
@@ -116,10 +258,10 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            self.write_log(name, type, message)
 
     def force_flush(self) -> None:
-        pass
+        self.sink.flush()
 
     def shutdown(self) -> None:
-        pass
\ No newline at end of file
+        self.sink.close()
\ No newline at end of file
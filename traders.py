@@ -1,7 +1,7 @@
 # Import AsyncExitStack for managing multiple async context managers
 from contextlib import AsyncExitStack
 # Import MCP resource functions for account and strategy data
-from accounts_client import read_accounts_resource, read_strategy_resource
+from accounts_client import read_account_view_resource, read_strategy_resource, record_portfolio_value
 # Import trace ID generation for debugging
 from tracers import make_trace_id
 # Import OpenAI Agents SDK core components
@@ -12,10 +12,6 @@ from openai import AsyncOpenAI
 from dotenv import load_dotenv
 # Import OS module for environment access
 import os
-# Import JSON parser for account data
-import json
-# Import MCP server stdio connector
-from agents.mcp import MCPServerStdio
 # Import instruction templates and message formatters
 from templates import (
     researcher_instructions,
@@ -26,6 +22,8 @@ from templates import (
 )
 # Import MCP server configuration parameters
 from mcp_params import trader_mcp_server_params, researcher_mcp_server_params
+# Import the floor-level manager that keeps MCP servers running between cycles
+from mcp_servers import MCPServerManager, make_server
 
 # Load environment variables, override existing values
 load_dotenv(override=True)
@@ -104,7 +102,7 @@ async def get_researcher_tool(mcp_servers, model_name) -> Tool:
 # Main Trader class for autonomous trading agents
 class Trader:
     # Initialize trader with name, lastname, and model configuration
-    def __init__(self, name: str, lastname="Trader", model_name="gpt-4o-mini"):
+    def __init__(self, name: str, lastname="Trader", model_name="gpt-4o-mini", mcp_servers: MCPServerManager | None = None):
         # Trader's first name (used for account identification)
         self.name = name
         # Trader's last name for display purposes
@@ -115,6 +113,8 @@ class Trader:
         self.model_name = model_name
         # Toggle between trading and rebalancing modes
         self.do_trade = True
+        # Shared MCP servers; without a manager, servers are started and stopped on every run
+        self.mcp_servers = mcp_servers
 
     # Create the main trader agent with research capabilities
     async def create_agent(self, trader_mcp_servers, researcher_mcp_servers) -> Agent:
@@ -131,16 +131,10 @@ class Trader:
         # Return the configured agent
         return self.agent
 
-    # Get simplified account report without time series data
+    # Get a compact account report: recent transactions and no time series, read without side effects
     async def get_account_report(self) -> str:
-        # Read account data from MCP resource
-        account = await read_accounts_resource(self.name)
-        # Parse JSON account data
-        account_json = json.loads(account)
-        # Remove time series data to reduce token usage
-        account_json.pop("portfolio_value_time_series", None)
-        # Return simplified account data as JSON string
-        return json.dumps(account_json)
+        # Read the projected account view from the MCP resource
+        return await read_account_view_resource(self.name)
 
     # Execute the trader agent with current market context
     async def run_agent(self, trader_mcp_servers, researcher_mcp_servers):
@@ -161,22 +155,24 @@ class Trader:
 
     # Manage MCP server connections using async context managers
     async def run_with_mcp_servers(self):
+        # Reuse the floor's long-running servers when there is a manager
+        if self.mcp_servers is not None:
+            trader_mcp_servers = await self.mcp_servers.get(trader_mcp_server_params)
+            researcher_mcp_servers = await self.mcp_servers.get(researcher_mcp_server_params(self.name))
+            await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
+            return
         # Use AsyncExitStack to manage multiple MCP server connections
         async with AsyncExitStack() as stack:
             # Create trader MCP server connections with 120s timeout
             trader_mcp_servers = [
-                await stack.enter_async_context(
-                    MCPServerStdio(params, client_session_timeout_seconds=120)
-                )
+                await stack.enter_async_context(make_server(params))
                 for params in trader_mcp_server_params
             ]
             # Nested context for researcher MCP servers
             async with AsyncExitStack() as stack:
                 # Create researcher MCP server connections with 120s timeout
                 researcher_mcp_servers = [
-                    await stack.enter_async_context(
-                        MCPServerStdio(params, client_session_timeout_seconds=120)
-                    )
+                    await stack.enter_async_context(make_server(params))
                     for params in researcher_mcp_server_params(self.name)
                 ]
                 # Run the agent with both server groups
@@ -201,5 +197,10 @@ class Trader:
         except Exception as e:
             # Log any errors that occur during execution
             print(f"Error running trader {self.name}: {e}")
+        try:
+            # Record one valuation per cycle, whether or not the agent traded, as the report read has no side effects
+            await record_portfolio_value(self.name)
+        except Exception as e:
+            print(f"Error recording portfolio value for {self.name}: {e}")
         # Toggle between trading and rebalancing modes for next run
         self.do_trade = not self.do_trade
@@ -3,7 +3,10 @@ from typing import List
 import asyncio
 from tracers import LogTracer
 from agents import add_trace_processor
-from market import is_market_open
+from market import is_market_open_async
+from market_calendar import seconds_until_open
+from mcp_servers import MCPServerManager
+from accounts_client import close_accounts_pool
 from dotenv import load_dotenv
 import os
 
@@ -31,22 +34,32 @@ else:
     short_model_names = ["GPT 4o mini"] * 4
 
 
-def create_traders() -> List[Trader]:
+def create_traders(mcp_servers: MCPServerManager | None = None) -> List[Trader]:
     traders = []
     for name, lastname, model_name in zip(names, lastnames, model_names):
-        traders.append(Trader(name, lastname, model_name))
+        traders.append(Trader(name, lastname, model_name, mcp_servers))
     return traders
 
 
 async def run_every_n_minutes():
     add_trace_processor(LogTracer())
-    traders = create_traders()
-    while True:
-        if RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open():
-            await asyncio.gather(*[trader.run() for trader in traders])
-        else:
-            print("Market is closed, skipping run")
-        await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
+    # MCP servers are started on the first cycle and stay up for the life of the floor
+    mcp_servers = MCPServerManager()
+    traders = create_traders(mcp_servers)
+    try:
+        while True:
+            if RUN_EVEN_WHEN_MARKET_IS_CLOSED or await is_market_open_async():
+                await asyncio.gather(*[trader.run() for trader in traders])
+                await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
+            else:
+                # Sleep straight through to the next open; if the calendar thinks the market is
+                # open but it isn't (an unscheduled closure), fall back to the normal interval
+                wait = seconds_until_open() or RUN_EVERY_N_MINUTES * 60
+                print(f"Market is closed, sleeping {wait / 60:.0f} minutes until the next open")
+                await asyncio.sleep(wait)
+    finally:
+        await mcp_servers.close()
+        await close_accounts_pool()
 
 
 if __name__ == "__main__":